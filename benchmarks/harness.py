@@ -0,0 +1,145 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks import the application straight from ``src`` (like ``worker.py``
+does), so everything that is read at import time - the webhook URL, the Redis
+connection, the SQLite file - has to be prepared *before* the first
+``transaction`` import. ``prepare_environment`` takes care of that.
+"""
+
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+
+class _WebhookStubHandler(BaseHTTPRequestHandler):
+    """Accept Glizer notifications and answer immediately."""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        self.server.received += 1
+        body = b'{"status": "received"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port() -> int:
+    """Return a TCP port that is currently free on localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_webhook_stub():
+    """Start a local Glizer webhook stub in a daemon thread.
+
+    Returns:
+        tuple: (server, url) - ``server.received`` counts delivered notifications.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), _WebhookStubHandler)
+    server.daemon_threads = True
+    server.received = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/webhook"
+
+
+def prepare_environment(redis_mode: str = "fake", webhook_url: str = None):
+    """Make the application importable and isolated for a benchmark run.
+
+    Args:
+        redis_mode (str): "fake" to back RQ with fakeredis, "local" to use the
+            Redis server configured through REDIS_HOST/REDIS_PORT.
+        webhook_url (str): Where Glizer notifications are sent.
+
+    Returns:
+        str: The temporary working directory holding the benchmark database.
+    """
+    if redis_mode == "fake":
+        import fakeredis
+        import redis
+
+        redis.Redis = fakeredis.FakeRedis
+
+    if webhook_url:
+        os.environ["GLIZER_WEBHOOK_URL"] = webhook_url
+    os.environ.setdefault("BOT_TOKEN", "bench-token")
+    # Keep per-request log lines out of the timings, and off stdout where
+    # the result document goes
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("LOG_STREAM", "stderr")
+
+    # The transaction DB lives at ./transactions.db, keep it out of the repo
+    workdir = tempfile.mkdtemp(prefix="glizer-bench-")
+    os.chdir(workdir)
+
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    return workdir
+
+
+def percentiles(samples, points=(50, 90, 95, 99)) -> dict:
+    """Summarise latency samples (seconds) as milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    summary = {
+        "min_ms": ordered[0] * 1000,
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+    for point in points:
+        # Nearest-rank percentile
+        index = max(0, min(len(ordered) - 1, int(round(point / 100 * len(ordered))) - 1))
+        summary[f"p{point}_ms"] = ordered[index] * 1000
+    return {key: round(value, 3) for key, value in summary.items()}
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_results(benchmark: str, params: dict, results: dict, output: str = None) -> dict:
+    """Emit a machine-readable result document.
+
+    The document is printed to stdout and, when ``output`` is given, written
+    to that path so runs from different commits can be diffed. ``output``
+    must already be absolute since ``prepare_environment`` changes directory.
+    """
+    document = {
+        "benchmark": benchmark,
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    text = json.dumps(document, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    print(text)
+    return document
+
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+API load generator.
+
+Drives ``POST /transaction/create`` and ``GET /transaction/{id}`` at a fixed
+concurrency and reports throughput and latency percentiles as JSON.
+
+By default the FastAPI app is served in-process by uvicorn, RQ is backed by
+fakeredis and the simulated recharge backend is selected (RECHARGE_BACKEND),
+so no browser or Redis server is needed. Optionally the queued jobs are
+drained with an in-process RQ worker to measure the queue/DB/webhook pipeline.
+
+Usage:
+    python benchmarks/load_test.py --requests 2000 --concurrency 32 --drain
+    python benchmarks/load_test.py --drain --latency uniform:0,0.05 --transient-failure-rate 0.1
+    python benchmarks/load_test.py --redis local --output bench.json
+    python benchmarks/load_test.py --url http://localhost:8000 --token BOT_TOKEN
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import harness
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint (default: 500)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients (default: 16)")
+    parser.add_argument("--redis", choices=["fake", "local"], default="fake", help="Redis backend (default: fake)")
+    parser.add_argument("--url", help="Benchmark an already running API instead of an in-process one")
+    parser.add_argument("--token", help="Bot token for --url (default: BOT_TOKEN)")
+    parser.add_argument("--backend", choices=["simulated", "selenium"], default="simulated",
+                        help="Recharge backend used when draining (default: simulated)")
+    parser.add_argument("--latency", default="fixed:0",
+                        help="Simulated recharge latency spec, e.g. uniform:2,8 (default: fixed:0)")
+    parser.add_argument("--transient-failure-rate", type=float, default=0.0,
+                        help="Share of simulated recharges failing with a retry (default: 0)")
+    parser.add_argument("--terminal-failure-rate", type=float, default=0.0,
+                        help="Share of simulated recharges failing for good (default: 0)")
+    parser.add_argument("--sla-classes", default="standard",
+                        help="Comma-separated SLA classes picked at random per order (default: standard)")
+    parser.add_argument("--drain", action="store_true", help="Process the queued jobs with an in-process worker")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    return parser.parse_args()
+
+
+def start_api_server():
+    """Serve ``main.app`` with uvicorn in a daemon thread.
+
+    Returns:
+        tuple: (base URL, stop callable)
+    """
+    import uvicorn
+
+    from main import app
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=harness.free_port(), log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+
+    return f"http://127.0.0.1:{config.port}", stop
+
+
+def run_phase(concurrency: int, count: int, send):
+    """Call ``send(session, index)`` ``count`` times from ``concurrency`` threads.
+
+    Returns:
+        tuple: (result dict, list of successful responses)
+    """
+    local = threading.local()
+    latencies, responses, errors = [], [], []
+    lock = threading.Lock()
+
+    def call(index):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = send(session, index)
+            ok = response.status_code == 200
+        except requests.RequestException as exc:
+            response, ok = exc, False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            (responses if ok else errors).append(response)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(count)))
+    duration = time.perf_counter() - started
+
+    result = {
+        "requests": count,
+        "errors": len(errors),
+        "duration_s": round(duration, 3),
+        "rps": round(count / duration, 1) if duration else None,
+        "latency": harness.percentiles(latencies),
+    }
+    return result, responses
+
+
+def drain_queue(stub, tx_ids):
+    """Run every queued job with a burst ``SimpleWorker`` and time it.
+
+    Orders still waiting in the per-client fair queues are dispatched first,
+    with the dispatch limit lifted so a single burst sees all of them.
+    """
+    from collections import Counter
+
+    from rq import SimpleWorker
+    from rq.serializers import JSONSerializer
+
+    from transaction.scheduling import DeadlineQueue
+    from transaction.service import dispatch_pending_orders, get_status
+    from transaction.worker import get_queues, get_redis_connection_rq
+
+    queues = get_queues()
+    notified_before = stub.received
+
+    started = time.perf_counter()
+    os.environ["DISPATCH_MAX_QUEUED"] = str(len(tx_ids) + sum(queue.count for queue in queues))
+    dispatch_pending_orders()
+    queued = sum(queue.count for queue in queues)
+
+    class BurstWorker(SimpleWorker):
+        # No pubsub command listener: its thread races the main thread on
+        # the shared fakeredis connection, and nothing sends commands here
+        def subscribe(self):
+            pass
+
+        def unsubscribe(self):
+            pass
+
+    worker = BurstWorker(
+        queues, connection=get_redis_connection_rq(), serializer=JSONSerializer, queue_class=DeadlineQueue
+    )
+    worker.work(burst=True, logging_level="WARNING")
+    duration = time.perf_counter() - started
+
+    return {
+        "jobs": queued,
+        "duration_s": round(duration, 3),
+        "jobs_per_minute": round(queued / duration * 60, 1) if duration else None,
+        "notifications": stub.received - notified_before,
+        "outcomes": dict(Counter(get_status(tx_id).status for tx_id in tx_ids)),
+    }
+
+
+def main():
+    args = parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    stub, webhook_url = harness.start_webhook_stub()
+    harness.prepare_environment(args.redis, webhook_url)
+    os.environ.update({
+        "RECHARGE_BACKEND": args.backend,
+        "SIMULATED_LATENCY": args.latency,
+        "SIMULATED_TRANSIENT_FAILURE_RATE": str(args.transient_failure_rate),
+        "SIMULATED_TERMINAL_FAILURE_RATE": str(args.terminal_failure_rate),
+    })
+    # A single client sends every order, don't let its quota reject them
+    os.environ.setdefault("DEFAULT_CLIENT_QUOTA", str(args.requests))
+
+    if args.url:
+        base_url, token = args.url.rstrip("/"), args.token or os.environ["BOT_TOKEN"]
+        stop_server = None
+    else:
+        (base_url, stop_server), token = start_api_server(), os.environ["BOT_TOKEN"]
+
+    headers = {"token": token}
+    sla_classes = args.sla_classes.split(",")
+
+    def create(session, index):
+        body = {
+            "itemType": random.choice(["diamonds", "golds"]),
+            "amount": random.choice([1, 2, 5, 10]),
+            "pinCode": f"BENCH{index:08d}",
+            "playerId": str(1000000 + index),
+            "slaClass": random.choice(sla_classes),
+        }
+        return session.post(f"{base_url}/transaction/create", json=body, headers=headers, timeout=30)
+
+    create_result, created = run_phase(args.concurrency, args.requests, create)
+    tx_ids = [response.json()["transactionsId"] for response in created]
+
+    def status(session, index):
+        return session.get(f"{base_url}/transaction/{tx_ids[index % len(tx_ids)]}", headers=headers, timeout=30)
+
+    results = {"create": create_result}
+    if tx_ids:
+        results["status"], _ = run_phase(args.concurrency, args.requests, status)
+    if args.drain and not args.url:
+        # Stop the API and its order dispatcher so the drain owns the queues
+        stop_server()
+        results["drain"] = drain_queue(stub, tx_ids)
+
+    params = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "redis": args.redis,
+        "target": "external" if args.url else "in-process",
+        "backend": args.backend,
+        "latency": args.latency,
+        "transient_failure_rate": args.transient_failure_rate,
+        "terminal_failure_rate": args.terminal_failure_rate,
+        "sla_classes": sla_classes,
+        "drain": args.drain,
+    }
+    harness.write_results("load_test", params, results, output)
+
+
+if __name__ == "__main__":
+    main()
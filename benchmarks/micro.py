@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the transaction hot helpers.
+
+Each benchmark times individual calls and reports ops/s plus latency
+percentiles as JSON, so results from different commits can be compared.
+
+Usage:
+    python benchmarks/micro.py
+    python benchmarks/micro.py --iterations 5000 --only clean_payload --output micro.json
+"""
+
+import argparse
+import os
+import time
+import uuid
+
+import harness
+
+SAMPLE_PAYLOAD = {
+    "itemType": "diamonds",
+    "amount": 10,
+    "pinCode": "3J22NN6P16KA",
+    "playerId": "7915329",
+    "notes": ["première", "recharge", "الماس"],
+    "meta": {"source": "bench", "attempt": 1, "tags": ("a", "b")},
+}
+
+
+def parse_args(names):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="Calls per benchmark (default: 2000)")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed calls before measuring (default: 50)")
+    parser.add_argument("--only", action="append", choices=names, help="Run only the given benchmark(s)")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    return parser.parse_args()
+
+
+def measure(func, iterations: int, warmup: int) -> dict:
+    """Time ``func(i)`` once per iteration after a warm-up."""
+    for i in range(warmup):
+        func(i)
+
+    samples = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - call_start)
+    total = time.perf_counter() - started
+
+    return {
+        "iterations": iterations,
+        "total_s": round(total, 4),
+        "ops_per_s": round(iterations / total, 1) if total else None,
+        "latency": harness.percentiles(samples),
+    }
+
+
+def build_benchmarks(service, utils):
+    """Map benchmark names to ``func(i)`` callables."""
+    tx_ids = [str(uuid.uuid4()) for _ in range(100)]
+    db = service.SessionLocal()
+    try:
+        db.add_all(service.Transaction(id=tx_id, status="pending") for tx_id in tx_ids)
+        db.commit()
+    finally:
+        db.close()
+
+    return {
+        "clean_payload": lambda i: service.clean_payload(SAMPLE_PAYLOAD),
+        "validate_payload_serialization": lambda i: service._validate_payload_serialization(SAMPLE_PAYLOAD),
+        "get_status": lambda i: service.get_status(tx_ids[i % len(tx_ids)]),
+        "update_status": lambda i: service.update_status(tx_ids[i % len(tx_ids)], "pending"),
+        "notify_glizer": lambda i: utils.notify_glizer(tx_ids[i % len(tx_ids)], "success"),
+    }
+
+
+BENCHMARK_NAMES = [
+    "clean_payload",
+    "validate_payload_serialization",
+    "get_status",
+    "update_status",
+    "notify_glizer",
+]
+
+
+def main():
+    args = parse_args(BENCHMARK_NAMES)
+    output = os.path.abspath(args.output) if args.output else None
+
+    stub, webhook_url = harness.start_webhook_stub()
+    harness.prepare_environment("fake", webhook_url)
+
+    from transaction import service, utils
+
+    benchmarks = build_benchmarks(service, utils)
+    selected = args.only or BENCHMARK_NAMES
+
+    results = {name: measure(benchmarks[name], args.iterations, args.warmup) for name in selected}
+
+    params = {"iterations": args.iterations, "warmup": args.warmup, "benchmarks": selected}
+    harness.write_results("micro", params, results, output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Context attached to every record logged while it is set
+tx_id_var = contextvars.ContextVar("tx_id", default=None)
+job_id_var = contextvars.ContextVar("job_id", default=None)
+step_var = contextvars.ContextVar("step", default=None)
+
+CONTEXT_VARS = {"tx_id": tx_id_var, "job_id": job_id_var, "step": step_var}
+
+REDACTED = "***"
+
+# key=value / "key": "value" pairs whose value is a credential
+SECRET_FIELDS = r"pin_?code|pin|token|password|passwd|secret|authorization|api_?key"
+SECRET_PAIR_RE = re.compile(
+    rf"""(?P<key>["']?\b(?:{SECRET_FIELDS})\b["']?\s*[:=]\s*)(?P<quote>["']?)(?:Bearer\s+)?[^\s"',;}}&]+""",
+    re.IGNORECASE,
+)
+# "pin ABC123...", "token abc..." in free text
+SECRET_WORD_RE = re.compile(
+    rf"(?P<key>\b(?:{SECRET_FIELDS})\s+)(?=[A-Za-z_\-]*\d)[A-Za-z0-9_\-]{{6,}}", re.IGNORECASE
+)
+# Gift card PINs: 10-16 upper-case letters and digits, mixing both
+PIN_RE = re.compile(r"\b(?=[A-Z0-9]*\d)(?=[A-Z0-9]*[A-Z])[A-Z0-9]{10,16}\b")
+
+# Environment variables holding credentials, their values are always masked
+SECRET_ENV_RE = re.compile(r"TOKEN|PASSWORD|SECRET", re.IGNORECASE)
+
+
+def _load_secret_values() -> set:
+    values = {value for name, value in os.environ.items() if SECRET_ENV_RE.search(name) and len(value) >= 6}
+    try:
+        for client in json.loads(os.getenv("API_CLIENTS") or "[]"):
+            if len(client.get("token", "")) >= 6:
+                values.add(client["token"])
+    except (ValueError, AttributeError):
+        pass
+    return values
+
+
+def redact(text: str, secrets=()) -> str:
+    """Mask PINs, tokens and known secret values in ``text``."""
+    for value in secrets:
+        if value in text:
+            text = text.replace(value, REDACTED)
+    text = SECRET_PAIR_RE.sub(lambda m: f"{m.group('key')}{m.group('quote')}{REDACTED}", text)
+    text = SECRET_WORD_RE.sub(lambda m: f"{m.group('key')}{REDACTED}", text)
+    return PIN_RE.sub(REDACTED, text)
+
+
+@contextmanager
+def log_context(**fields):
+    """Attach tx_id, job_id and/or step to the records logged inside the block."""
+    tokens = [(CONTEXT_VARS[name], CONTEXT_VARS[name].set(value)) for name, value in fields.items()]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the logging context onto records, in the thread that logs them."""
+
+    def filter(self, record):
+        for name, var in CONTEXT_VARS.items():
+            if getattr(record, name, None) is None:
+                setattr(record, name, var.get())
+        return True
+
+
+class RedactFilter(logging.Filter):
+    """Mask secrets in the message, structured fields and traceback of a prepared record."""
+
+    def __init__(self, secrets=()):
+        super().__init__()
+        self.secrets = sorted(secrets, key=len, reverse=True)
+
+    def filter(self, record):
+        record.msg = redact(str(record.msg), self.secrets)
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = json.loads(redact(json.dumps(fields, ensure_ascii=False, default=str), self.secrets))
+        if record.exc_text:
+            record.exc_text = redact(record.exc_text, self.secrets)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record.
+
+    Structured data can be passed with ``extra={"fields": {...}}``.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        for name in CONTEXT_VARS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the context appended."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        context = " ".join(
+            f"{name}={getattr(record, name)}" for name in CONTEXT_VARS if getattr(record, name, None) is not None
+        )
+        return f"{line} [{context}]" if context else line
+
+
+class ContextQueueHandler(QueueHandler):
+    """Queue records for the listener thread.
+
+    Only the message interpolation happens in the calling thread, formatting
+    and writing are left to the listener. Records below the logger level are
+    dropped before that, so disabled debug calls cost nothing.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_lock = threading.Lock()
+_handler = None
+_listener = None
+
+
+def _build_listener(log_queue: queue.Queue) -> QueueListener:
+    log_format = os.getenv("LOG_FORMAT", "json").lower()
+    stream = sys.stdout if os.getenv("LOG_STREAM", "stderr").lower() == "stdout" else sys.stderr
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+    output.addFilter(RedactFilter(_load_secret_values()))
+    return QueueListener(log_queue, output, respect_handler_level=True)
+
+
+def _restart_after_fork():
+    """The listener thread does not survive fork(), give the child its own."""
+    global _listener, _lock
+    _lock = threading.Lock()
+    if _handler is None:
+        return
+    log_queue = queue.Queue(-1)
+    _handler.queue = log_queue
+    _listener = _build_listener(log_queue)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def flush_logging():
+    """Write out every queued record (e.g. before os._exit in a work horse)."""
+    with _lock:
+        if _listener is not None and _listener._thread is not None:
+            _listener.stop()
+            _listener.start()
+
+
+def configure_logging(level: str = None):
+    """Route all logging through a queue to a background writer thread.
+
+    Records are written to stderr (LOG_STREAM=stdout to change) as JSON
+    (LOG_FORMAT=text for plain lines) with their tx_id, job_id and step, and
+    with PINs and tokens masked. Safe to call more than once.
+    """
+    global _handler, _listener
+    with _lock:
+        level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+        root = logging.getLogger()
+        root.setLevel(level)
+        if _handler is not None:
+            return
+
+        log_queue = queue.Queue(-1)
+        _handler = ContextQueueHandler(log_queue)
+        _handler.addFilter(ContextFilter())
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_handler)
+
+        _listener = _build_listener(log_queue)
+        _listener.start()
+        atexit.register(_stop_listener)
+        os.register_at_fork(after_in_child=_restart_after_fork)
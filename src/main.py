@@ -6,40 +6,65 @@ import logging
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
+from logging_setup import configure_logging
 from transaction.routes import router as transaction_router
-from transaction.service import resume_pending_transactions
+from transaction.service import dispatch_pending_orders, reconcile_pending_transactions
 
 load_dotenv()
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
+async def run_fair_dispatcher():
+    """Keep feeding the workers from the per-client queues."""
+    interval = float(os.getenv("DISPATCH_INTERVAL_SECONDS", "0.5"))
+    while True:
+        try:
+            dispatched = await asyncio.to_thread(dispatch_pending_orders)
+        except Exception as e:
+            logger.error("Error dispatching orders: %s", e)
+            dispatched = 0
+        # Nothing to do or workers saturated, wait before polling again
+        if not dispatched:
+            await asyncio.sleep(interval)
+
+
+async def run_reconciler():
+    """Repair pending transactions that lost their job, one batch per period."""
+    interval = float(os.getenv("PERIOD_CHECKING_SECONDS", "10"))
+    while True:
+        try:
+            counts = await asyncio.to_thread(reconcile_pending_transactions)
+            repaired = {state: n for state, n in counts.items() if state not in ("alive", "checked")}
+            if repaired:
+                logger.info("Reconciled pending transactions: %s", repaired)
+        except Exception as e:
+            logger.error("Error reconciling pending transactions: %s", e)
+        await asyncio.sleep(interval)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle application startup and shutdown."""
     # Startup
-    logger.info("Starting up - checking for pending transactions...")
-    
-    try:
-        # resume_pending_transactions()
-        logger.info("Startup transaction resume completed")
-    except Exception as e:
-        logger.error(f"Error during startup transaction resume: {str(e)}")
+    logger.info("Starting up - reconciling pending transactions in the background...")
     
-    # Start the periodic checker
-    # checker_task = asyncio.create_task(periodic_transaction_checker())
+    # Start the periodic checker and the order dispatcher
+    checker_task = asyncio.create_task(run_reconciler())
+    dispatcher_task = asyncio.create_task(run_fair_dispatcher())
     
     yield
     
     # Shutdown
     logger.info("Shutting down...")
-    # checker_task.cancel()
-    # try:
-    #     await checker_task
-    # except asyncio.CancelledError:
-    #     pass
+    for task in (checker_task, dispatcher_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
 
 
 app = FastAPI(lifespan=lifespan)
@@ -52,4 +77,5 @@ async def health_check():
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # log_config=None: uvicorn logs go through our handlers
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
\ No newline at end of file
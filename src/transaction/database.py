@@ -1,6 +1,10 @@
-from sqlalchemy import create_engine
+import logging
+
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = "sqlite:///./transactions.db"
 
 # SQLite specific flag for multithreading
@@ -14,8 +18,32 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def _add_missing_columns(connection):
+    """Add the nullable columns a table created by an older version lacks.
+
+    ``create_all`` only creates missing tables; existing rows get NULL in the
+    new columns, which the service treats as the column's default.
+    """
+    for table in Base.metadata.sorted_tables:
+        existing = {row[1] for row in connection.execute(text(f'PRAGMA table_info("{table.name}")'))}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                logger.error("Cannot add NOT NULL column %s.%s to the existing table", table.name, column.name)
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+            logger.warning("Added column %s.%s to the existing database", table.name, column.name)
+            for index in table.indexes:
+                if column in index.columns.values():
+                    index.create(bind=connection, checkfirst=True)
+
+
 def init_db():
-    """Create tables if they do not exist."""
+    """Create tables if they do not exist and add columns missing from older databases."""
     from . import models  # ensures model metadata is registered
 
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        _add_missing_columns(connection)
@@ -0,0 +1,278 @@
+import bisect
+import json
+import logging
+import time
+from typing import Callable, Dict
+
+from rq.utils import as_text
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+ENTRIES_KEY = "fairq:entries"  # tx_id -> JSON entry awaiting dispatch
+ACTIVE_CLIENTS_KEY = "fairq:active"  # client ids with queued orders
+DEFICITS_KEY = "fairq:deficits"  # client id -> credits left from its last turn
+CURSOR_KEY = "fairq:cursor"  # "<credited>|<client id>" whose turn comes next
+DISPATCH_LOCK_KEY = "fairq:dispatch:lock"  # held by the API process dispatching
+
+# Number of recent wait samples kept per client for percentiles
+WAIT_SAMPLES = 1000
+
+
+def client_queue_key(client_id: str) -> str:
+    """Sorted set of a client's order ids scored by deadline (epoch seconds)."""
+    return f"fairq:orders:{client_id}"
+
+
+def client_metrics_key(client_id: str) -> str:
+    return f"fairq:metrics:{client_id}"
+
+
+def client_waits_key(client_id: str) -> str:
+    return f"fairq:waits:{client_id}"
+
+
+def submit(connection, client_id: str, tx_id: str, entry: dict, deadline: float):
+    """Queue an order on its client's queue until the dispatcher picks it.
+
+    ``deadline`` (epoch seconds) orders the client's queue, most urgent first.
+    """
+    entry = dict(entry, client_id=client_id, submitted_at=time.time())
+    pipe = connection.pipeline()
+    pipe.hset(ENTRIES_KEY, tx_id, json.dumps(entry, ensure_ascii=False))
+    pipe.zadd(client_queue_key(client_id), {tx_id: deadline})
+    pipe.sadd(ACTIVE_CLIENTS_KEY, client_id)
+    pipe.execute()
+
+
+def queue_depth(connection, client_id: str) -> int:
+    return connection.zcard(client_queue_key(client_id))
+
+
+def is_awaiting_dispatch(connection, tx_id: str) -> bool:
+    return bool(connection.hexists(ENTRIES_KEY, tx_id))
+
+
+def _record_wait(connection, client_id: str, wait: float):
+    wait_ms = int(wait * 1000)
+    pipe = connection.pipeline()
+    pipe.hincrby(client_metrics_key(client_id), "dispatched", 1)
+    pipe.hincrby(client_metrics_key(client_id), "wait_total_ms", wait_ms)
+    pipe.lpush(client_waits_key(client_id), wait_ms)
+    pipe.ltrim(client_waits_key(client_id), 0, WAIT_SAMPLES - 1)
+    pipe.execute()
+
+
+def _record_expired(connection, client_id: str):
+    connection.hincrby(client_metrics_key(client_id), "expired", 1)
+
+
+def get_client_metrics(connection, client_ids) -> Dict[str, dict]:
+    """Queue depth, dispatch wait statistics and expired orders per client."""
+    metrics = {}
+    for client_id in sorted(set(client_ids) | {as_text(c) for c in connection.smembers(ACTIVE_CLIENTS_KEY)}):
+        counters = {as_text(k): int(v) for k, v in connection.hgetall(client_metrics_key(client_id)).items()}
+        waits = sorted(int(w) for w in connection.lrange(client_waits_key(client_id), 0, -1))
+        dispatched = counters.get("dispatched", 0)
+        metrics[client_id] = {
+            "queued": queue_depth(connection, client_id),
+            "dispatched": dispatched,
+            "wait_avg_ms": counters.get("wait_total_ms", 0) // dispatched if dispatched else 0,
+            "wait_p95_ms": waits[max(0, int(len(waits) * 0.95) - 1)] if waits else 0,
+            "wait_max_ms": waits[-1] if waits else 0,
+            "expired": counters.get("expired", 0),
+        }
+    return metrics
+
+
+class FairDispatcher:
+    """Deficit round-robin over the per-client order queues.
+
+    Every round each active client earns ``quantum * weight`` credits and may
+    dispatch one order per credit, so a client with a large backlog cannot
+    hold the workers while others wait. Within its turn a client hands out
+    its earliest-deadline orders first. Orders already past their deadline
+    are passed to ``expire`` instead, without using a credit or capacity, at
+    most ``max_expired`` per call so that a large expired backlog is drained
+    over several calls rather than holding up dispatching.
+    Dispatching stops once the downstream RQ queues hold ``capacity()``
+    orders, keeping them shallow so the order in which work reaches the
+    workers is decided here.
+
+    The round-robin state lives in Redis so that several API processes share
+    one round; they must not run ``dispatch_once`` at the same time (see
+    ``DISPATCH_LOCK_KEY``).
+
+    Args:
+        connection: Redis connection (decoded responses).
+        dispatch (callable): ``dispatch(tx_id, entry)`` enqueues an order for the workers.
+        capacity (callable): Number of orders that may be dispatched right now.
+        weight (callable): ``weight(client_id)`` relative share of a client.
+        expire (callable): ``expire(tx_id, entry)`` fails an order past its deadline.
+        quantum (int): Credits per round for a weight of 1.
+        max_expired (int): Expired orders handled per call.
+    """
+
+    def __init__(
+        self,
+        connection,
+        dispatch: Callable[[str, dict], None],
+        capacity: Callable[[], int],
+        weight: Callable[[str], int],
+        expire: Callable[[str, dict], None],
+        quantum: int = 1,
+        max_expired: int = 100,
+    ):
+        self.connection = connection
+        self.dispatch = dispatch
+        self.capacity = capacity
+        self.weight = weight
+        self.expire = expire
+        self.quantum = quantum
+        self.max_expired = max_expired
+        self.deficits: Dict[str, float] = {}
+        # Where the next call resumes the round, and whether that client
+        # already received its credits for it
+        self._cursor = None
+        self._cursor_credited = False
+
+    def _load_state(self):
+        self.deficits = {as_text(k): float(v) for k, v in self.connection.hgetall(DEFICITS_KEY).items()}
+        cursor = self.connection.get(CURSOR_KEY)
+        if cursor:
+            credited, _, client_id = as_text(cursor).partition("|")
+            self._cursor, self._cursor_credited = client_id, credited == "1"
+        else:
+            self._cursor, self._cursor_credited = None, False
+
+    def _save_state(self):
+        pipe = self.connection.pipeline()
+        pipe.delete(DEFICITS_KEY)
+        if self.deficits:
+            pipe.hset(DEFICITS_KEY, mapping=self.deficits)
+        if self._cursor is not None:
+            pipe.set(CURSOR_KEY, f"{int(self._cursor_credited)}|{self._cursor}")
+        pipe.execute()
+
+    def _active_clients(self) -> list:
+        """Active clients in round order, starting at the cursor."""
+        clients = sorted(as_text(c) for c in self.connection.smembers(ACTIVE_CLIENTS_KEY))
+        if self._cursor is not None:
+            start = bisect.bisect_left(clients, self._cursor)
+            clients = clients[start:] + clients[:start]
+        return clients
+
+    def _pop(self, client_id: str):
+        """Pop the most urgent order of a client that is still within its deadline.
+
+        Returns:
+            tuple: (tx_id, entry or None), None when nothing can be dispatched
+        """
+        key = client_queue_key(client_id)
+        while True:
+            head = self.connection.zrangebyscore(key, time.time(), "+inf", start=0, num=1)
+            if not head:
+                if not self.connection.zcard(key):
+                    self.connection.srem(ACTIVE_CLIENTS_KEY, client_id)
+                    # An order may have been submitted in between
+                    if self.connection.zcard(key):
+                        self.connection.sadd(ACTIVE_CLIENTS_KEY, client_id)
+                # Expired orders left are handled by _expire_due
+                return None
+            tx_id = as_text(head[0])
+            if self.connection.zrem(key, tx_id):
+                break
+        raw = self.connection.hget(ENTRIES_KEY, tx_id)
+        # Drop the entry before dispatching: if we die in between, the
+        # transaction is left pending without a job and the reconciler picks it up
+        self.connection.hdel(ENTRIES_KEY, tx_id)
+        return tx_id, json.loads(raw) if raw else None
+
+    def _expire_due(self, limit: int) -> int:
+        """Pass up to ``limit`` orders past their deadline to ``expire``.
+
+        Returns:
+            int: Number of orders expired.
+        """
+        expired = 0
+        now = time.time()
+        for client_id in self._active_clients():
+            if expired >= limit:
+                break
+            key = client_queue_key(client_id)
+            for tx_id in self.connection.zrangebyscore(key, "-inf", now, start=0, num=limit - expired):
+                tx_id = as_text(tx_id)
+                if not self.connection.zrem(key, tx_id):
+                    continue
+                raw = self.connection.hget(ENTRIES_KEY, tx_id)
+                self.connection.hdel(ENTRIES_KEY, tx_id)
+                expired += 1
+                _record_expired(self.connection, client_id)
+                try:
+                    self.expire(tx_id, json.loads(raw) if raw else {})
+                except Exception as e:
+                    logger.error("Failed to expire order %s of client %s: %s", tx_id, client_id, e)
+        return expired
+
+    def dispatch_once(self) -> int:
+        """Expire overdue orders, then run DRR rounds until the queues are
+        empty or capacity is used up.
+
+        Returns:
+            int: Number of orders dispatched.
+        """
+        self._load_state()
+        self._expire_due(self.max_expired)
+        budget = self.capacity()
+        if budget <= 0:
+            return 0
+        try:
+            return self._dispatch_rounds(budget)
+        finally:
+            self._save_state()
+
+    def _dispatch_rounds(self, budget: int) -> int:
+        dispatched = 0
+        clients = self._active_clients()
+
+        while budget > 0 and clients:
+            round_clients = list(clients)
+            for position, client_id in enumerate(round_clients):
+                if client_id == self._cursor and self._cursor_credited:
+                    self._cursor_credited = False
+                else:
+                    self.deficits[client_id] = (
+                        self.deficits.get(client_id, 0) + self.quantum * self.weight(client_id)
+                    )
+
+                while self.deficits.get(client_id, 0) >= 1 and budget > 0:
+                    popped = self._pop(client_id)
+                    if popped is None:
+                        # Idle clients don't bank credits
+                        self.deficits.pop(client_id, None)
+                        clients.remove(client_id)
+                        break
+                    tx_id, entry = popped
+                    self.deficits[client_id] -= 1
+                    if entry is None:
+                        logger.warning("Order %s of client %s has no queue entry, skipping", tx_id, client_id)
+                        continue
+                    try:
+                        self.dispatch(tx_id, entry)
+                    except Exception as e:
+                        logger.error("Failed to dispatch order %s of client %s: %s", tx_id, client_id, e)
+                        continue
+                    _record_wait(self.connection, client_id, time.time() - entry["submitted_at"])
+                    budget -= 1
+                    dispatched += 1
+
+                if budget <= 0:
+                    if client_id in clients and self.deficits.get(client_id, 0) >= 1:
+                        # Interrupted mid-turn, finish it next time
+                        self._cursor, self._cursor_credited = client_id, True
+                    else:
+                        next_client = round_clients[(position + 1) % len(round_clients)]
+                        self._cursor, self._cursor_credited = next_client, False
+                    break
+
+        return dispatched
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, String, Text, Integer
+from datetime import datetime
+
+from sqlalchemy import Column, String, Text, Integer, DateTime
 
 from .database import Base
 
@@ -10,4 +12,8 @@ class Transaction(Base):
     status = Column(String, index=True)
     order_type = Column(String, index=True)  # e.g., "yalla_ludo"
     order_payload = Column(Text)  # JSON string of the order data
-    remaining_retries = Column(Integer, default=3)  # Number of retries left 
\ No newline at end of file
+    remaining_retries = Column(Integer, default=3)  # Number of retries left 
+    sla_class = Column(String, index=True, default="standard")  # "express", "standard" or "bulk"
+    deadline = Column(DateTime, nullable=True, index=True)  # UTC, order is dropped once passed
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    client_id = Column(String, index=True, default="default")  # API client that placed the order
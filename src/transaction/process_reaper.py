@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+
+import psutil
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Environment tags inherited by every process a job starts (chromedriver,
+# Chrome and its helpers), so they can be found even once reparented
+JOB_TAG = "GLIZER_JOB_ID"
+WORKER_TAG = "GLIZER_WORKER_NAME"
+
+
+def find_tagged_processes(tag: str, value: str) -> list:
+    """Processes whose environment has ``tag=value``."""
+    own_pid = os.getpid()
+    processes = []
+    for proc in psutil.process_iter():
+        if proc.pid == own_pid:
+            continue
+        try:
+            if proc.environ().get(tag) == value:
+                processes.append(proc)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            continue
+    return processes
+
+
+def reap_tagged_processes(tag: str, value: str, timeout: float = 5) -> int:
+    """Terminate (then kill) the processes tagged ``tag=value``.
+
+    Returns:
+        int: Number of processes that were still running.
+    """
+    processes = find_tagged_processes(tag, value)
+    if not processes:
+        return 0
+
+    for proc in processes:
+        try:
+            proc.terminate()
+        except psutil.NoSuchProcess:
+            pass
+    _, alive = psutil.wait_procs(processes, timeout=timeout)
+    for proc in alive:
+        try:
+            proc.kill()
+        except psutil.NoSuchProcess:
+            pass
+    psutil.wait_procs(alive, timeout=timeout)
+    return len(processes)
+
+
+def get_available_memory_mb() -> float:
+    return psutil.virtual_memory().available / 1024 / 1024
+
+
+class ResourceSampler:
+    """Samples the memory and CPU of a process and its descendants in a thread.
+
+    Peak RSS is the largest sum of the tree's resident memory seen at one
+    sample. CPU time adds up the last value seen for every process, so
+    processes that exit between two samples lose at most one interval.
+    """
+
+    def __init__(self, pid: int = None, interval: float = 0.5):
+        self.pid = pid or os.getpid()
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_processes = 0
+        self._cpu = {}
+        self._baseline = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+
+    def start(self):
+        self.sample()
+        # CPU already used before the job (when sampling the worker itself)
+        self._baseline = dict(self._cpu)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        try:
+            root = psutil.Process(self.pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return
+
+        rss = 0
+        for proc in processes:
+            try:
+                with proc.oneshot():
+                    rss += proc.memory_info().rss
+                    times = proc.cpu_times()
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            self._cpu[proc.pid] = max(self._cpu.get(proc.pid, 0), times.user + times.system)
+        self.peak_rss = max(self.peak_rss, rss)
+        self.peak_processes = max(self.peak_processes, len(processes))
+
+    def stop(self) -> dict:
+        """Stop sampling and return the job's resource usage."""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.sample()
+        return {
+            "peak_rss_mb": round(self.peak_rss / 1024 / 1024, 1),
+            "cpu_seconds": round(
+                sum(max(0, cpu - self._baseline.get(pid, 0)) for pid, cpu in self._cpu.items()), 2
+            ),
+            "peak_processes": self.peak_processes,
+        }
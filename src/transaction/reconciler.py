@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
+
+from . import fair_queue
+from .scheduling import utcnow
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Position of the last transaction checked, "<created_at iso>|<id>"
+WATERMARK_KEY = "transactions:reconciler:watermark"
+# Transactions seen without a live job: tx_id -> first time seen (epoch)
+SUSPECTS_KEY = "transactions:reconciler:suspects"
+# Held by the API process running a pass
+LOCK_KEY = "transactions:reconciler:lock"
+
+# What the reconciler should do with a pending transaction
+ALIVE = "alive"  # queued, running or waiting for a retry, leave it
+ORPHANED = "orphaned"  # no live job, re-enqueue
+EXHAUSTED = "exhausted"  # job failed for good, mark as error
+FINISHED = "finished"  # job ran to completion but the status was never saved
+
+# Job states that will still run on their own
+LIVE_STATUSES = {JobStatus.SCHEDULED, JobStatus.DEFERRED}
+FAILED_STATUSES = {JobStatus.FAILED, JobStatus.STOPPED, JobStatus.CANCELED}
+
+
+@contextmanager
+def pass_lock(connection, key: str = LOCK_KEY, ttl: int = 300):
+    """Yield whether this process got the right to run a pass (reconciliation by default).
+
+    While held, the lock's TTL is renewed every ``ttl / 3`` seconds so that a
+    slow pass keeps it; the TTL only frees the lock of a process that died.
+    """
+    token = uuid.uuid4().hex
+    acquired = bool(connection.set(key, token, nx=True, ex=ttl))
+    released = threading.Event()
+
+    def renew():
+        while not released.wait(ttl / 3):
+            if connection.get(key) != token:
+                logger.warning("Lost lock %s during the pass", key)
+                return
+            connection.expire(key, ttl)
+
+    if acquired:
+        threading.Thread(target=renew, name=f"renew-{key}", daemon=True).start()
+    try:
+        yield acquired
+    finally:
+        released.set()
+        if acquired and connection.get(key) == token:
+            connection.delete(key)
+
+
+def get_watermark(connection) -> Optional[Tuple[datetime, str]]:
+    """(created_at, id) of the last transaction checked, None to start over."""
+    value = connection.get(WATERMARK_KEY)
+    if not value:
+        return None
+    created_at, _, tx_id = value.partition("|")
+    return datetime.fromisoformat(created_at), tx_id
+
+
+def set_watermark(connection, created_at: Optional[datetime], tx_id: str = None):
+    if created_at is None:
+        connection.delete(WATERMARK_KEY)
+    else:
+        connection.set(WATERMARK_KEY, f"{created_at.isoformat()}|{tx_id}")
+
+
+def get_job_state(tx_id: str, queues: dict, connection, rq_connection, serializer, stale_after: float) -> Tuple[str, Optional[Job]]:
+    """Classify the RQ job of a pending transaction (job ids are tx ids).
+
+    Args:
+        tx_id (str): Transaction id.
+        queues (dict): Transaction queues by name.
+        connection: General Redis connection (fair queue entries).
+        rq_connection: RQ Redis connection.
+        serializer: RQ serializer of the jobs.
+        stale_after (float): Seconds without heartbeat after which a started
+            job is considered dead with its worker.
+
+    Returns:
+        tuple: (state, job or None)
+    """
+    if fair_queue.is_awaiting_dispatch(connection, tx_id):
+        return ALIVE, None
+
+    try:
+        job = Job.fetch(tx_id, connection=rq_connection, serializer=serializer)
+        status = job.get_status(refresh=False)
+    except NoSuchJobError:
+        return ORPHANED, None
+    except Exception as e:
+        # Unreadable job data, it will never run
+        logger.warning("Cannot load job %s: %s", tx_id, e)
+        return ORPHANED, Job(tx_id, connection=rq_connection, serializer=serializer)
+
+    if status == JobStatus.QUEUED:
+        queue = queues.get(job.origin)
+        if queue is not None and queue.get_job_position(tx_id) is not None:
+            return ALIVE, job
+        # Claimed from its queue by a worker that died before starting it
+        return ORPHANED, job
+
+    if status == JobStatus.STARTED:
+        heartbeat = job.last_heartbeat or job.started_at
+        if heartbeat and utcnow() - heartbeat.replace(tzinfo=None) < timedelta(seconds=stale_after):
+            return ALIVE, job
+        # The work horse stopped sending heartbeats, its worker is gone
+        return ORPHANED, job
+
+    if status in LIVE_STATUSES:
+        return ALIVE, job
+    if status in FAILED_STATUSES:
+        return EXHAUSTED, job
+    if status == JobStatus.FINISHED:
+        return FINISHED, job
+
+    # Created but never enqueued
+    return ORPHANED, job
+
+
+def confirm_orphan(connection, tx_id: str, confirm_after: float) -> bool:
+    """Whether a transaction has been orphaned for at least ``confirm_after`` seconds.
+
+    A transaction is briefly without a live job while it moves between the
+    fair queue, an RQ queue and a worker; acting only on orphans seen again
+    on a later pass avoids enqueueing it twice.
+    """
+    now = time.time()
+    first_seen = connection.hget(SUSPECTS_KEY, tx_id)
+    if first_seen is None:
+        connection.hset(SUSPECTS_KEY, tx_id, now)
+        return False
+    if now - float(first_seen) < confirm_after:
+        return False
+    connection.hdel(SUSPECTS_KEY, tx_id)
+    return True
+
+
+def due_suspects(connection, confirm_after: float) -> list:
+    """Suspects first seen at least ``confirm_after`` seconds ago."""
+    cutoff = time.time() - confirm_after
+    return [tx_id for tx_id, first_seen in connection.hgetall(SUSPECTS_KEY).items() if float(first_seen) <= cutoff]
+
+
+def clear_suspect(connection, tx_id: str):
+    connection.hdel(SUSPECTS_KEY, tx_id)
+
+
+def prune_suspects(connection, max_age: float = 3600):
+    """Forget suspects that were never seen again (finished in between)."""
+    cutoff = time.time() - max_age
+    stale = [tx_id for tx_id, first_seen in connection.hgetall(SUSPECTS_KEY).items() if float(first_seen) < cutoff]
+    if stale:
+        connection.hdel(SUSPECTS_KEY, *stale)
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Header, HTTPException
 
 from yalla_ludo.schema import YallaLoadRequest
 
-from .schema import TransactionIDResponse, TransactionStatusResponse
+from .schema import MetricsResponse, TransactionIDResponse, TransactionStatusResponse
 from .utils import check_bot_token
 from . import service
 
@@ -15,15 +15,25 @@ async def create_transaction(
     token: str = Header(...),
 ):
     """Create a new transaction. Currently supports only Yalla load."""
-    check_bot_token(token)
+    client = check_bot_token(token)
 
-    return service.create_yalla_transaction(yalla_body)
+    try:
+        return service.create_yalla_transaction(yalla_body, client)
+    except service.QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+@router.get("/metrics", response_model=MetricsResponse)
+async def get_metrics(token: str = Header(...)):
+    """Scheduling metrics, including deadline misses per SLA class."""
+    client = check_bot_token(token)
+    return service.get_metrics(client)
 
 
 @router.get("/{transaction_id}", response_model=TransactionStatusResponse)
 async def get_transaction_status(transaction_id: str, token: str = Header(...)):
-    check_bot_token(token)
+    client = check_bot_token(token)
     try:
-        return service.get_status(transaction_id)
+        return service.get_status(transaction_id, client)
     except KeyError:
         raise HTTPException(status_code=404, detail="Unknown transaction id")
\ No newline at end of file
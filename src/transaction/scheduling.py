@@ -0,0 +1,172 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from rq import Queue
+from rq.exceptions import NoSuchJobError
+from rq.utils import as_text, backend_class
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLA_CLASS = "standard"
+
+# Default time budget (seconds) of each SLA class, overridable with SLA_<CLASS>_SECONDS
+SLA_CLASS_SECONDS = {
+    "express": 5 * 60,
+    "standard": 30 * 60,
+    "bulk": 2 * 60 * 60,
+}
+
+# RQ queue of each SLA class, in the order workers listen to them.
+# The standard class keeps the original queue name.
+SLA_QUEUE_NAMES = {
+    "express": "transactions_express",
+    "standard": "transactions",
+    "bulk": "transactions_bulk",
+}
+
+DEADLINE_METRICS_KEY = "transactions:deadline_metrics"
+
+# Job meta field holding the deadline (epoch seconds) the job is indexed by
+DEADLINE_META_KEY = "deadline"
+
+
+def utcnow() -> datetime:
+    """Naive UTC now, the format deadlines are stored in."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def get_sla_seconds(sla_class: str) -> int:
+    return int(os.getenv(f"SLA_{sla_class.upper()}_SECONDS", SLA_CLASS_SECONDS[sla_class]))
+
+
+def resolve_deadline(
+    deadline: Optional[datetime], sla_class: Optional[str], now: datetime = None
+) -> Tuple[str, datetime]:
+    """Work out the SLA class and absolute deadline of a new transaction.
+
+    An explicit deadline wins over the class budget. Deadlines are returned as
+    naive UTC datetimes; naive inputs are assumed to already be UTC.
+    """
+    sla_class = sla_class or DEFAULT_SLA_CLASS
+    now = now or utcnow()
+    if deadline is None:
+        return sla_class, now + timedelta(seconds=get_sla_seconds(sla_class))
+    if deadline.tzinfo is not None:
+        deadline = deadline.astimezone(timezone.utc).replace(tzinfo=None)
+    return sla_class, deadline
+
+
+def deadline_index_key(queue_name: str) -> str:
+    """Sorted set of job ids scored by deadline for one queue."""
+    return f"rq:deadlines:{queue_name}"
+
+
+def record_deadline_outcome(connection, sla_class: str, outcome: str):
+    """Count a deadline outcome ("met", "missed" or "expired") for a class."""
+    try:
+        connection.hincrby(DEADLINE_METRICS_KEY, f"{sla_class or DEFAULT_SLA_CLASS}:{outcome}", 1)
+    except Exception as e:
+        logger.warning("Failed to record deadline metric: %s", e)
+
+
+def get_deadline_metrics(connection) -> dict:
+    """Deadline counters per SLA class."""
+    metrics = {
+        sla_class: {"met": 0, "missed": 0, "expired": 0}
+        for sla_class in SLA_CLASS_SECONDS
+    }
+    for field, value in connection.hgetall(DEADLINE_METRICS_KEY).items():
+        sla_class, _, outcome = as_text(field).partition(":")
+        metrics.setdefault(sla_class, {"met": 0, "missed": 0, "expired": 0})[outcome] = int(value)
+    return metrics
+
+
+class DeadlineQueue(Queue):
+    """RQ queue dequeuing earliest-deadline-first across several queues.
+
+    Each queue keeps a sorted set of its job ids scored by deadline next to
+    the regular RQ list. Workers claim the job with the earliest deadline
+    among all the queues they listen to by removing it from its list (LREM is
+    atomic, so only one worker wins). Jobs without a deadline entry are
+    dequeued in FIFO order once no indexed job is left.
+
+    The deadline is kept in the job meta so that every enqueue through this
+    class indexes the job again, RQ retries included. RQ's scheduler and
+    registry requeues use a plain ``Queue`` and only get the FIFO fallback.
+    """
+
+    def enqueue_with_deadline(self, f, *args, deadline: datetime, job_id: str, **kwargs):
+        """Enqueue ``f`` and index the job by deadline."""
+        meta = dict(kwargs.pop("meta", None) or {})
+        meta[DEADLINE_META_KEY] = deadline.replace(tzinfo=timezone.utc).timestamp()
+        return self.enqueue(f, *args, job_id=job_id, meta=meta, **kwargs)
+
+    def _enqueue_job(self, job, pipeline=None, at_front=False, unique=False):
+        deadline = job.meta.get(DEADLINE_META_KEY)
+        if deadline is not None:
+            # Index first (or in the same transaction) so the job is never
+            # visible without its deadline
+            (pipeline if pipeline is not None else self.connection).zadd(
+                deadline_index_key(self.name), {job.id: deadline}
+            )
+        return super()._enqueue_job(job, pipeline=pipeline, at_front=at_front, unique=unique)
+
+    @classmethod
+    def _claim_earliest(cls, queues, connection):
+        """Remove and return (queue, job_id) of the earliest indexed job."""
+        while True:
+            candidates = []
+            for queue in queues:
+                head = connection.zrange(deadline_index_key(queue.name), 0, 0, withscores=True)
+                if head:
+                    job_id, score = head[0]
+                    candidates.append((score, queue, as_text(job_id)))
+            if not candidates:
+                return None
+
+            _, queue, job_id = min(candidates, key=lambda c: c[0])
+            claimed = connection.lrem(queue.key, 1, job_id)
+            connection.zrem(deadline_index_key(queue.name), job_id)
+            if claimed:
+                return queue, job_id
+            # Stale entry (job already taken or removed), look again
+
+    @classmethod
+    def dequeue_any(
+        cls,
+        queues,
+        timeout,
+        connection,
+        job_class=None,
+        serializer=None,
+        death_penalty_class=None,
+    ):
+        job_cls = backend_class(cls, 'job_class', override=job_class)
+
+        while True:
+            claimed = cls._claim_earliest(queues, connection)
+            if claimed is None:
+                break
+            queue, job_id = claimed
+            try:
+                job = job_cls.fetch(job_id, connection=connection, serializer=serializer)
+            except NoSuchJobError:
+                continue
+            return job, queue
+
+        # Nothing indexed: block on the lists like a regular RQ queue
+        result = super().dequeue_any(
+            queues,
+            timeout,
+            connection=connection,
+            job_class=job_class,
+            serializer=serializer,
+            death_penalty_class=death_penalty_class,
+        )
+        if result is not None:
+            job, queue = result
+            connection.zrem(deadline_index_key(queue.name), job.id)
+        return result
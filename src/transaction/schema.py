@@ -1,7 +1,8 @@
-from pydantic import BaseModel
-from typing import Literal
+from pydantic import BaseModel, Field
+from typing import Dict, Literal
 
 TransactionStatus = Literal["success", "error", "pending"]
+SLAClass = Literal["express", "standard", "bulk"]
 
 
 class TransactionIDResponse(BaseModel):
@@ -15,4 +16,34 @@ class TransactionStatusResponse(BaseModel):
 class GlizerWebhookPayload(BaseModel):
     event: Literal["ON_TRANSACTION_STATUS_CHANGED"] = "ON_TRANSACTION_STATUS_CHANGED"
     transactionsId: str
-    status: TransactionStatus
\ No newline at end of file
+    status: TransactionStatus
+
+
+class DeadlineMetrics(BaseModel):
+    met: int = 0
+    missed: int = 0
+    expired: int = 0
+    queued: int = 0
+
+
+class ClientMetrics(BaseModel):
+    queued: int = 0
+    dispatched: int = 0
+    wait_avg_ms: int = 0
+    wait_p95_ms: int = 0
+    wait_max_ms: int = 0
+    expired: int = 0
+
+
+class MetricsResponse(BaseModel):
+    deadlines: Dict[str, DeadlineMetrics]
+    clients: Dict[str, ClientMetrics] = {}
+
+
+class ApiClient(BaseModel):
+    """A client allowed to call the bot API."""
+
+    id: str
+    token: str
+    quota: int = 100  # Max orders waiting for dispatch (pending without fair dispatch)
+    weight: int = Field(1, ge=1)  # Share of worker capacity under contention
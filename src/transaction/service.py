@@ -2,16 +2,30 @@ import uuid
 import json
 import logging
 import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 from rq import Retry
+from rq.serializers import JSONSerializer
 
-from yalla_ludo.schema import YallaLoadRequest
-from yalla_ludo.service import yalla_pay_recharge
+from yalla_ludo.schema import SCHEDULING_FIELDS, YallaLoadRequest
+from yalla_ludo.backends import TerminalRechargeError, get_recharge_backend
+from . import fair_queue, reconciler
 from .database import SessionLocal, init_db
+from .fair_queue import FairDispatcher
 from .models import Transaction
-from .schema import TransactionStatusResponse, TransactionIDResponse, TransactionStatus
-from .utils import notify_glizer
-from .worker import get_queue
+from .scheduling import (
+    SLA_QUEUE_NAMES,
+    get_deadline_metrics,
+    record_deadline_outcome,
+    resolve_deadline,
+    utcnow,
+)
+from .schema import ApiClient, MetricsResponse, TransactionStatusResponse, TransactionIDResponse, TransactionStatus
+from .utils import DEFAULT_CLIENT_ID, get_api_clients, get_client_weight, notify_glizer
+from .worker import get_queue, get_queues, get_redis_connection, get_redis_connection_rq
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -20,6 +34,10 @@ logger = logging.getLogger(__name__)
 init_db()
 
 
+class QuotaExceededError(Exception):
+    """Raised when a client already has its quota of orders waiting."""
+
+
 def _get_db_session() -> Session:
     """Helper to get a transactional DB session."""
     return SessionLocal()
@@ -36,44 +54,65 @@ def _validate_payload_serialization(payload: dict) -> dict:
         # Test serialization/deserialization
         json_str = json.dumps(payload, ensure_ascii=False)
         validated_payload = json.loads(json_str)
-        logger.debug(f"Payload validation successful: {len(json_str)} characters")
+        logger.debug("Payload validation successful: %s characters", len(json_str))
         return validated_payload
     except (TypeError, ValueError, UnicodeError) as e:
-        logger.error(f"Payload serialization validation failed: {str(e)}")
+        logger.error("Payload serialization validation failed: %s", e)
         raise ValueError(f"Invalid payload for job serialization: {str(e)}")
 
 
-def cleanup_orphaned_transactions():
-    """Clean up any pending transactions that might reference corrupted Redis job data."""
+def _is_fair_dispatch_enabled() -> bool:
+    """Whether orders go through the per-client fair queues."""
+    return os.getenv("FAIR_DISPATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def _get_dispatch_capacity() -> int:
+    """Orders the dispatcher may still hand to the workers right now."""
+    limit = int(os.getenv("DISPATCH_MAX_QUEUED", "10"))
+    return limit - sum(queue.count for queue in get_queues())
+
+
+def _count_waiting_orders(client_id: str, fair_dispatch: bool) -> int:
+    """Orders of a client counted against its quota.
+
+    With fair dispatch these are the orders waiting in its queue, otherwise
+    its pending transactions (queued or running).
+    """
+    if fair_dispatch:
+        return fair_queue.queue_depth(get_redis_connection(), client_id)
+    db = _get_db_session()
     try:
-        
-        logger.info("Checking for orphaned pending transactions...")
-        
-        db = _get_db_session()
-        try:
-            # Get all pending transactions
-            pending_txs = db.query(Transaction).filter(
-                Transaction.status == "pending"
-            ).all()
-            
-            if pending_txs:
-                logger.warning(f"Found {len(pending_txs)} pending transactions, clearing them due to Redis reset")
-                
-                # Mark all as error since Redis was cleared
-                for tx in pending_txs:
-                    tx.status = "error"
-                    logger.info(f"Marked transaction {tx.id} as error due to Redis cleanup")
-                
-                db.commit()
-                logger.info(f"Cleaned up {len(pending_txs)} orphaned transactions")
-            else:
-                logger.info("No orphaned transactions found")
-                
-        finally:
-            db.close()
-            
-    except Exception as e:
-        logger.error(f"Error during transaction cleanup: {str(e)}")
+        owner = Transaction.client_id == client_id
+        if client_id == DEFAULT_CLIENT_ID:
+            # Rows created before API clients existed
+            owner = or_(owner, Transaction.client_id.is_(None))
+        return db.query(Transaction).filter(Transaction.status == "pending", owner).count()
+    finally:
+        db.close()
+
+
+def _get_transaction(tx_id: str):
+    """Get a transaction as currently stored, or None."""
+    db = _get_db_session()
+    try:
+        return db.query(Transaction).get(tx_id)
+    finally:
+        db.close()
+
+
+def _enqueue_transaction(func, tx_id: str, *args, sla_class: str, deadline, max_retries: int):
+    """Enqueue a job on its SLA queue, indexed by deadline and keyed by tx_id."""
+    sla_class, deadline = resolve_deadline(deadline, sla_class)
+    return get_queue(sla_class).enqueue_with_deadline(
+        func,
+        tx_id,
+        *args,
+        deadline=deadline,
+        job_id=tx_id,
+        retry=Retry(max=max_retries),
+        on_failure=on_job_failure,
+        job_timeout='10m'  # 10 minute timeout per job
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -81,57 +120,92 @@ def cleanup_orphaned_transactions():
 # ---------------------------------------------------------------------------
 
 def process_yalla_load_job(tx_id: str, order_payload: dict):
-    """RQ job function to process Yalla load transaction."""
+    """RQ job function to process Yalla load transaction.
+
+    Returns:
+        str: The status the transaction ended with, kept by RQ as the job
+        result so the reconciler can recover it.
+    """
     try:
         # Validate input parameters
         if not isinstance(tx_id, str) or not isinstance(order_payload, dict):
             raise ValueError(f"Invalid job parameters: tx_id={type(tx_id)}, payload={type(order_payload)}")
-        
-        logger.info(f"Processing Yalla load transaction {tx_id}")
+
+        # A job re-enqueued by the reconciler may find its transaction already settled
+        tx = _get_transaction(tx_id)
+        if tx is not None and tx.status != "pending":
+            logger.warning("Transaction %s is already %s, skipping", tx_id, tx.status)
+            return tx.status
+
+        # Orders past their deadline are dropped before any browser work
+        sla_class, deadline = (tx.sla_class, tx.deadline) if tx else (None, None)
+        if deadline and utcnow() > deadline:
+            logger.warning("Transaction %s expired at %sZ, skipping", tx_id, deadline.isoformat())
+            record_deadline_outcome(get_redis_connection(), sla_class, "expired")
+            update_status(tx_id, "error", notify=True)
+            return "error"
+
+        logger.info("Processing Yalla load transaction %s", tx_id)
         
         # Parse the payload as YallaLoadRequest
         yalla_request = YallaLoadRequest(**order_payload)
         
-        # Run the YallaPay recharge flow
-        succeeded = yalla_pay_recharge(
-            amount=yalla_request.amount,
-            itemType=yalla_request.itemType,
-            playerId=yalla_request.playerId,
-            pinCode=yalla_request.pinCode,
-        )
+        # Run the recharge on the configured backend (Selenium or simulated)
+        try:
+            succeeded = get_recharge_backend().recharge(
+                amount=yalla_request.amount,
+                itemType=yalla_request.itemType,
+                playerId=yalla_request.playerId,
+                pinCode=yalla_request.pinCode,
+            )
+        except TerminalRechargeError as e:
+            # Retrying cannot help, fail the transaction without raising
+            logger.error("Transaction %s failed permanently: %s", tx_id, e)
+            if update_status(tx_id, "error", notify=True) and deadline and utcnow() > deadline:
+                record_deadline_outcome(get_redis_connection(), sla_class, "missed")
+            return "error"
 
         if succeeded:
             update_status(tx_id, "success", notify=True)
-            logger.info(f"Transaction {tx_id} completed successfully")
+            if deadline:
+                outcome = "met" if utcnow() <= deadline else "missed"
+                record_deadline_outcome(get_redis_connection(), sla_class, outcome)
+            logger.info("Transaction %s completed successfully", tx_id)
+            return "success"
         else:
             # Let RQ handle the retry mechanism
             raise Exception(f"YallaPay recharge failed for transaction {tx_id}")
             
     except Exception as e:
-        logger.error(f"Error processing Yalla load transaction {tx_id}: {str(e)}")
+        logger.error("Error processing Yalla load transaction %s: %s", tx_id, e)
         # Mark as error only if this is the final attempt (RQ will handle this automatically)
         raise e
 
 
 def on_job_failure(job, connection, type, value, traceback):
-    """Callback function called when an RQ job fails permanently."""
+    """Callback function called when an RQ job attempt fails."""
+    # RQ runs the callback before scheduling the retry, only the last attempt fails the transaction
+    if job.should_retry:
+        return
     tx_id = job.args[0] if job.args else None
     if tx_id:
-        logger.error(f"Transaction {tx_id} failed permanently after all retries")
-        update_status(tx_id, "error", notify=True)
+        logger.error("Transaction %s failed permanently after all retries", tx_id)
+        tx = _get_transaction(tx_id)
+        if update_status(tx_id, "error", notify=True) and tx is not None and tx.deadline and utcnow() > tx.deadline:
+            record_deadline_outcome(get_redis_connection(), tx.sla_class, "missed")
 
 
 def process_transaction_by_type_job(tx_id: str, order_type: str, order_payload: dict):
     """RQ job function to process a transaction based on its order type."""
     try:
         if order_type == "yalla_ludo":
-            process_yalla_load_job(tx_id, order_payload)
+            return process_yalla_load_job(tx_id, order_payload)
         else:
-            logger.error(f"Unknown order type: {order_type} for transaction {tx_id}")
+            logger.error("Unknown order type: %s for transaction %s", order_type, tx_id)
             update_status(tx_id, "error", notify=True)
             raise Exception(f"Unknown order type: {order_type}")
     except Exception as e:
-        logger.error(f"Error processing transaction {tx_id}: {str(e)}")
+        logger.error("Error processing transaction %s: %s", tx_id, e)
         raise e
 
 
@@ -175,14 +249,27 @@ def clean_payload(payload):
         except Exception:
             return "<non-serializable object>"
 
-def create_yalla_transaction(body: YallaLoadRequest) -> TransactionIDResponse:
-    """Create a new Yalla transaction and enqueue its processing."""
+def create_yalla_transaction(body: YallaLoadRequest, client: ApiClient = None) -> TransactionIDResponse:
+    """Create a new Yalla transaction and enqueue its processing.
+
+    With fair dispatch enabled the order is queued on its client's queue and
+    handed to the workers by ``dispatch_pending_orders``.
+
+    Raises:
+        QuotaExceededError: The client already has ``quota`` orders waiting.
+    """
     tx_id = str(uuid.uuid4())
+    client_id = client.id if client else DEFAULT_CLIENT_ID
+    fair_dispatch = _is_fair_dispatch_enabled()
+
+    if client and _count_waiting_orders(client_id, fair_dispatch) >= client.quota:
+        raise QuotaExceededError(f"Client {client_id} already has {client.quota} orders waiting")
     
-    # Store the order payload as JSON
-    order_payload = body.model_dump()
+    # Store the order payload as JSON, scheduling options get their own columns
+    order_payload = body.model_dump(exclude=SCHEDULING_FIELDS)
     order_type = "yalla_ludo"
     max_retries = _get_max_retries()
+    sla_class, deadline = resolve_deadline(body.deadline, body.slaClass)
 
     # Validate payload can be serialized properly
     validated_payload = _validate_payload_serialization(order_payload)
@@ -193,7 +280,10 @@ def create_yalla_transaction(body: YallaLoadRequest) -> TransactionIDResponse:
             id=tx_id, 
             status="pending",
             order_type=order_type,
-            order_payload=json.dumps(validated_payload, ensure_ascii=False)
+            order_payload=json.dumps(validated_payload, ensure_ascii=False),
+            sla_class=sla_class,
+            deadline=deadline,
+            client_id=client_id
         ))
         db.commit()
     finally:
@@ -201,21 +291,28 @@ def create_yalla_transaction(body: YallaLoadRequest) -> TransactionIDResponse:
 
     # Enqueue job with RQ with retry configuration
     try:
-        queue = get_queue()
-        retry = Retry(max=max_retries)
-        
-        job = queue.enqueue(
+        if fair_dispatch:
+            fair_queue.submit(get_redis_connection(), client_id, tx_id, {
+                "order_type": order_type,
+                "payload": validated_payload,
+                "sla_class": sla_class,
+                "deadline": deadline.isoformat(),
+            }, deadline=deadline.replace(tzinfo=timezone.utc).timestamp())
+            logger.info("Queued transaction %s for client %s", tx_id, client_id)
+            return TransactionIDResponse(transactionsId=tx_id)
+
+        job = _enqueue_transaction(
             process_yalla_load_job,
             tx_id,
             clean_payload(validated_payload),
-            retry=retry,
-            on_failure=on_job_failure,
-            job_timeout='10m'  # 10 minute timeout per job
+            sla_class=sla_class,
+            deadline=deadline,
+            max_retries=max_retries
         )
         
-        logger.info(f"Enqueued transaction {tx_id} as job {job.id} with {max_retries} max retries")
+        logger.info("Enqueued %s transaction %s as job %s with %s max retries", sla_class, tx_id, job.id, max_retries)
     except Exception as e:
-        logger.error(f"Failed to enqueue transaction {tx_id}: {str(e)}")
+        logger.error("Failed to enqueue transaction %s: %s", tx_id, e)
         # Mark transaction as error if we can't enqueue it
         update_status(tx_id, "error", notify=True)
         raise
@@ -223,82 +320,290 @@ def create_yalla_transaction(body: YallaLoadRequest) -> TransactionIDResponse:
     return TransactionIDResponse(transactionsId=tx_id)
 
 
-def get_status(tx_id: str) -> TransactionStatusResponse:
+def get_status(tx_id: str, client: ApiClient = None) -> TransactionStatusResponse:
+    """Status of a transaction.
+
+    The default client (BOT_TOKEN) sees every transaction, other clients only
+    their own: another client's transaction is reported as unknown.
+    """
     db = _get_db_session()
     try:
         tx = db.query(Transaction).get(tx_id)
         if not tx:
             raise KeyError("Unknown transaction id")
+        if client is not None and client.id != DEFAULT_CLIENT_ID and tx.client_id != client.id:
+            raise KeyError("Unknown transaction id")
         return TransactionStatusResponse(status=tx.status)
     finally:
         db.close()
 
 
-def update_status(tx_id: str, status: TransactionStatus, notify: bool = False):
+def update_status(tx_id: str, status: TransactionStatus, notify: bool = False) -> bool:
+    """Settle a pending transaction.
+
+    Only pending transactions are updated (and notified): the first outcome
+    recorded wins, a late or duplicate run of the job cannot overwrite it.
+
+    Returns:
+        bool: Whether the transaction was still pending.
+    """
     db = _get_db_session()
     try:
-        tx = db.query(Transaction).get(tx_id)
-        if not tx:
-            tx = Transaction(id=tx_id, status=status)
-            db.add(tx)
-        else:
-            tx.status = status
+        updated = db.query(Transaction).filter(
+            Transaction.id == tx_id, Transaction.status == "pending"
+        ).update({Transaction.status: status}, synchronize_session=False)
         db.commit()
     finally:
         db.close()
 
+    if not updated:
+        logger.warning("Transaction %s is not pending anymore, not setting it to %s", tx_id, status)
+        return False
     if notify:
         notify_glizer(tx_id, status)
+    return True
+
+
+def _dispatch_order(tx_id: str, entry: dict):
+    """Hand an order from its client queue to the workers."""
+    try:
+        _enqueue_transaction(
+            process_transaction_by_type_job,
+            tx_id,
+            entry["order_type"],
+            entry["payload"],
+            sla_class=entry.get("sla_class"),
+            deadline=datetime.fromisoformat(entry["deadline"]) if entry.get("deadline") else None,
+            max_retries=_get_max_retries()
+        )
+    except Exception as e:
+        logger.error("Failed to enqueue transaction %s: %s", tx_id, e)
+        update_status(tx_id, "error", notify=True)
+
 
+# Sends the Glizer notifications of expired orders, off the dispatch pass
+_notifier = ThreadPoolExecutor(max_workers=4, thread_name_prefix="expiry-notify")
+
+
+def _notify_expired(tx_id: str):
+    notify_glizer(tx_id, "error")
+
+
+def _expire_order(tx_id: str, entry: dict):
+    """Fail an order that passed its deadline while waiting for dispatch."""
+    logger.warning("Transaction %s expired at %sZ before dispatch, skipping", tx_id, entry.get("deadline"))
+    record_deadline_outcome(get_redis_connection(), entry.get("sla_class"), "expired")
+    if update_status(tx_id, "error"):
+        _notifier.submit(_notify_expired, tx_id)
+
+
+_dispatcher = None
+
+
+def dispatch_pending_orders() -> int:
+    """Move orders from the per-client queues to the workers (deficit round-robin).
+
+    Returns:
+        int: Number of orders dispatched.
+    """
+    global _dispatcher
+    connection = get_redis_connection()
+    if _dispatcher is None:
+        _dispatcher = FairDispatcher(
+            connection,
+            dispatch=_dispatch_order,
+            capacity=_get_dispatch_capacity,
+            weight=get_client_weight,
+            expire=_expire_order,
+            max_expired=int(os.getenv("DISPATCH_MAX_EXPIRED", "100")),
+        )
+    with reconciler.pass_lock(connection, fair_queue.DISPATCH_LOCK_KEY, ttl=60) as acquired:
+        if not acquired:
+            # Another API process is dispatching
+            return 0
+        return _dispatcher.dispatch_once()
+
+
+def get_metrics(client: ApiClient = None) -> MetricsResponse:
+    """Scheduling metrics: deadline outcomes and queue depth per SLA class and client.
+
+    The default client (BOT_TOKEN) sees every client, other clients only themselves.
+    """
+    connection = get_redis_connection()
+    deadlines = get_deadline_metrics(connection)
+    for sla_class in SLA_QUEUE_NAMES:
+        deadlines[sla_class]["queued"] = get_queue(sla_class).count
+    if client is None or client.id == DEFAULT_CLIENT_ID:
+        client_ids = [api_client.id for api_client in get_api_clients()]
+        clients = fair_queue.get_client_metrics(connection, client_ids)
+    else:
+        clients = {client.id: fair_queue.get_client_metrics(connection, [client.id])[client.id]}
+    return MetricsResponse(deadlines=deadlines, clients=clients)
+
+
+def _requeue_orphan(tx: Transaction, job):
+    """Enqueue a fresh job for a transaction whose job is gone, or fail it when out of retries."""
+    if job is not None:
+        # Drop what is left of the dead job from its queue and registries
+        try:
+            job.delete()
+        except Exception:
+            get_redis_connection_rq().delete(job.key)
+
+    if not tx.order_payload or (tx.remaining_retries or 0) <= 0:
+        logger.error("Transaction %s lost its job and has no retries left, marking as error", tx.id)
+        update_status(tx.id, "error", notify=True)
+        return
 
-def get_pending_transactions():
-    """Get all pending transactions from the database."""
     db = _get_db_session()
     try:
-        pending_txs = db.query(Transaction).filter(
-            Transaction.status == "pending"
-        ).all()
-        return pending_txs
+        claimed = db.query(Transaction).filter(
+            Transaction.id == tx.id,
+            Transaction.status == "pending",
+            Transaction.remaining_retries > 0,
+        ).update(
+            {Transaction.remaining_retries: Transaction.remaining_retries - 1}, synchronize_session=False
+        )
+        db.commit()
     finally:
         db.close()
+    if not claimed:
+        # Settled (or re-enqueued) in the meantime
+        return
+
+    validated_payload = _validate_payload_serialization(json.loads(tx.order_payload))
+    _enqueue_transaction(
+        process_transaction_by_type_job,
+        tx.id,
+        tx.order_type,
+        clean_payload(validated_payload),
+        sla_class=tx.sla_class,
+        deadline=tx.deadline,
+        max_retries=_get_max_retries()
+    )
+    logger.warning("Re-enqueued orphaned transaction %s (%s retries left)", tx.id, tx.remaining_retries - 1)
+
+
+def _get_job_outcome(job):
+    """Status returned by a finished job, None when it did not record one."""
+    try:
+        outcome = job.return_value()
+    except Exception:
+        return None
+    return outcome if outcome in ("success", "error") else None
+
+
+def _reconcile_transaction(tx_id: str, queues: dict, connection, confirm_after: float, stale_after: float) -> str:
+    """Check a pending transaction against its RQ job and repair it.
+
+    Returns:
+        str: The outcome to count (a ``reconciler`` job state, "suspected",
+        "settled" or "unresolved").
+    """
+    state, job = reconciler.get_job_state(
+        tx_id, queues, connection, get_redis_connection_rq(), JSONSerializer, stale_after
+    )
+
+    # Read the row after the job: a job saves the transaction status before
+    # RQ marks it finished, so a settled job is never mistaken for a lost one
+    tx = _get_transaction(tx_id)
+    if tx is None or tx.status != "pending":
+        reconciler.clear_suspect(connection, tx_id)
+        return "settled"
+
+    if state == reconciler.ORPHANED:
+        if not reconciler.confirm_orphan(connection, tx_id, confirm_after):
+            return "suspected"
+        _requeue_orphan(tx, job)
+        return state
+
+    reconciler.clear_suspect(connection, tx_id)
+    if state == reconciler.EXHAUSTED:
+        logger.error("Transaction %s job ended as %s, marking as error", tx_id, job.get_status(refresh=False).value)
+        update_status(tx_id, "error", notify=True)
+    elif state == reconciler.FINISHED:
+        # The recharge ran, never run it again; its result tells how it ended
+        outcome = _get_job_outcome(job)
+        if outcome is None:
+            logger.error("Transaction %s job finished without an outcome, leaving it pending for a manual check", tx_id)
+            return "unresolved"
+        logger.warning("Transaction %s job finished as %s without saving it, saving it now", tx_id, outcome)
+        update_status(tx_id, outcome, notify=True)
+    return state
+
+
+def reconcile_pending_transactions() -> dict:
+    """Repair pending transactions whose RQ job is gone.
+
+    Each call first checks again the transactions found orphaned by earlier
+    calls, so they are repaired as soon as they are confirmed rather than when
+    the batches come back round to them. It then checks one batch of pending
+    transactions, oldest first, starting after the watermark left by the
+    previous call; once the end is reached the next call starts over.
+    Transactions younger than RECONCILE_GRACE_SECONDS are left alone while
+    they are being enqueued.
+
+    Returns:
+        dict: Number of transactions per outcome.
+    """
+    connection = get_redis_connection()
+    with reconciler.pass_lock(connection) as acquired:
+        if not acquired:
+            # Another API process is reconciling
+            return {}
+
+        batch_size = int(os.getenv("RECONCILE_BATCH_SIZE", "100"))
+        grace = int(os.getenv("RECONCILE_GRACE_SECONDS", "30"))
+        confirm_after = float(os.getenv("RECONCILE_CONFIRM_SECONDS", "10"))
+        stale_after = float(os.getenv("RECONCILE_STALE_SECONDS", "60"))
+        watermark = reconciler.get_watermark(connection)
 
-
-def resume_pending_transactions():
-    """Resume all pending transactions found in the database."""
-    pending_txs = get_pending_transactions()
-    
-    logger.info(f"Found {len(pending_txs)} pending transactions to resume")
-    
-    queue = get_queue()
-    max_retries = _get_max_retries()
-    
-    for tx in pending_txs:
+        db = _get_db_session()
         try:
-            if tx.order_payload:
-                order_payload = json.loads(tx.order_payload)
-                
-                # Validate payload can be serialized properly
-                validated_payload = _validate_payload_serialization(order_payload)
-                
-                logger.info(f"Resuming transaction {tx.id} of type {tx.order_type}")
-                
-                # Enqueue with max retries from environment
-                retry = Retry(max=max_retries)
-                
-                job = queue.enqueue(
-                    process_transaction_by_type_job,
-                    tx.id,
-                    tx.order_type,
-                    clean_payload(validated_payload),
-                    retry=retry,
-                    on_failure=on_job_failure,
-                    job_timeout='10m'
-                )
-                
-                logger.info(f"Re-enqueued transaction {tx.id} as job {job.id} with {max_retries} max retries")
-            else:
-                logger.warning(f"Transaction {tx.id} has no order payload, marking as error")
-                update_status(tx.id, "error", notify=True)
-        except Exception as e:
-            logger.error(f"Error resuming transaction {tx.id}: {str(e)}")
-            update_status(tx.id, "error", notify=True)
\ No newline at end of file
+            if watermark is None:
+                # Rows from before created_at existed would never be reached
+                db.query(Transaction).filter(
+                    Transaction.status == "pending", Transaction.created_at.is_(None)
+                ).update({Transaction.created_at: utcnow()})
+                db.commit()
+
+            query = db.query(Transaction).filter(
+                Transaction.status == "pending",
+                Transaction.created_at <= utcnow() - timedelta(seconds=grace),
+            )
+            if watermark is not None:
+                created_at, tx_id = watermark
+                query = query.filter(or_(
+                    Transaction.created_at > created_at,
+                    and_(Transaction.created_at == created_at, Transaction.id > tx_id),
+                ))
+            pending_txs = query.order_by(Transaction.created_at, Transaction.id).limit(batch_size).all()
+        finally:
+            db.close()
+
+        if len(pending_txs) < batch_size:
+            reconciler.set_watermark(connection, None)
+            reconciler.prune_suspects(connection)
+        else:
+            reconciler.set_watermark(connection, pending_txs[-1].created_at, pending_txs[-1].id)
+
+        queues = {queue.name: queue for queue in get_queues()}
+        counts = Counter()
+        rechecked = set(reconciler.due_suspects(connection, confirm_after))
+        for tx_id in rechecked:
+            try:
+                counts[_reconcile_transaction(tx_id, queues, connection, confirm_after, stale_after)] += 1
+            except Exception as e:
+                logger.error("Error reconciling transaction %s: %s", tx_id, e)
+                counts["errors"] += 1
+
+        for tx in pending_txs:
+            if tx.id in rechecked:
+                continue
+            try:
+                counts[_reconcile_transaction(tx.id, queues, connection, confirm_after, stale_after)] += 1
+            except Exception as e:
+                logger.error("Error reconciling transaction %s: %s", tx.id, e)
+                counts["errors"] += 1
+
+        return dict(counts, checked=len(pending_txs))
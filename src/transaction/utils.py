@@ -1,17 +1,63 @@
 import os
+import json
+import logging
 import requests
 from fastapi import HTTPException
 
+from .schema import ApiClient
+
 # Tokens/URLs configurable via environment variables
 BOT_TOKEN = os.getenv("BOT_TOKEN", "123456789")
 GLIZER_TOKEN = os.getenv("GLIZER_TOKEN", "123456789")
 GLIZER_WEBHOOK_URL = os.getenv("GLIZER_WEBHOOK_URL", "http://localhost:8001/webhook")
 
+DEFAULT_CLIENT_ID = "default"
+
+logger = logging.getLogger(__name__)
+
+
+def _load_api_clients() -> dict:
+    """Load API clients keyed by token.
+
+    Clients come from API_CLIENTS, a JSON list such as
+    ``[{"id": "reseller-a", "token": "...", "quota": 200, "weight": 2}]``.
+    BOT_TOKEN stays valid as the "default" client.
+    """
+    clients = {}
+    for item in json.loads(os.getenv("API_CLIENTS") or "[]"):
+        client = ApiClient(**item)
+        clients[client.token] = client
+    if BOT_TOKEN and BOT_TOKEN not in clients:
+        clients[BOT_TOKEN] = ApiClient(
+            id=DEFAULT_CLIENT_ID,
+            token=BOT_TOKEN,
+            quota=int(os.getenv("DEFAULT_CLIENT_QUOTA", "100")),
+        )
+    return clients
+
+
+API_CLIENTS = _load_api_clients()
+
+
+def get_api_clients() -> list:
+    """Get all configured API clients."""
+    return list(API_CLIENTS.values())
+
+
+def get_client_weight(client_id: str) -> int:
+    """Get the fair-scheduling weight of a client (1 if unknown)."""
+    for client in API_CLIENTS.values():
+        if client.id == client_id:
+            return client.weight
+    return 1
+
 
-def check_bot_token(token: str):
+def check_bot_token(token: str) -> ApiClient:
     """Validate the token provided by clients calling the bot API."""
-    if token != BOT_TOKEN:
+    client = API_CLIENTS.get(token)
+    if client is None:
         raise HTTPException(status_code=401, detail="Invalid bot token")
+    return client
 
 
 def check_glizer_token(token: str):
@@ -34,5 +80,4 @@ def notify_glizer(transaction_id: str, status: str):
     try:
         requests.post(GLIZER_WEBHOOK_URL, json=payload, headers=headers, timeout=10)
     except requests.RequestException as exc:
-        # Log the error; in production use proper logging
-        print(f"Failed to notify Glizer: {exc}")
\ No newline at end of file
+        logger.warning("Failed to notify Glizer of transaction %s: %s", transaction_id, exc)
\ No newline at end of file
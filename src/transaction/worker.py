@@ -1,8 +1,17 @@
 import os
 import logging
+import threading
+import time
 from redis import Redis
-from rq import Queue, Worker
+from rq import Worker
 from rq.serializers import JSONSerializer
+from rq.worker_pool import WorkerPool
+
+from logging_setup import flush_logging, log_context
+from yalla_ludo.service import start_shared_chrome
+from yalla_ludo.shared_browser import get_chrome_mode
+from .process_reaper import JOB_TAG, WORKER_TAG, ResourceSampler, get_available_memory_mb, reap_tagged_processes
+from .scheduling import DEFAULT_SLA_CLASS, SLA_QUEUE_NAMES, DeadlineQueue
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -29,10 +38,10 @@ def create_redis_connection_for_rq():
         )
         # Test the connection
         redis_conn.ping()
-        logger.info(f"Successfully connected RQ Redis at {REDIS_HOST}:{REDIS_PORT}")
+        logger.info("Successfully connected RQ Redis at %s:%s", REDIS_HOST, REDIS_PORT)
         return redis_conn
     except Exception as e:
-        logger.error(f"Failed to connect to Redis for RQ: {str(e)}")
+        logger.error("Failed to connect to Redis for RQ: %s", e)
         raise
 
 def create_redis_connection_general():
@@ -53,28 +62,37 @@ def create_redis_connection_general():
         )
         # Test the connection
         redis_conn.ping()
-        logger.info(f"Successfully connected general Redis at {REDIS_HOST}:{REDIS_PORT}")
+        logger.info("Successfully connected general Redis at %s:%s", REDIS_HOST, REDIS_PORT)
         return redis_conn
     except Exception as e:
-        logger.error(f"Failed to connect to Redis for general use: {str(e)}")
+        logger.error("Failed to connect to Redis for general use: %s", e)
         raise
 
 # Create Redis connections - separate for RQ and general use
 redis_conn_rq = create_redis_connection_for_rq()
 redis_conn_general = create_redis_connection_general()
 
-# Create RQ queue with the binary-compatible Redis connection
+# Create one RQ queue per SLA class with the binary-compatible Redis connection
 # Use JSONSerializer for payload but allow RQ to handle compression
-transaction_queue = Queue(
-    "transactions", 
-    connection=redis_conn_rq,  # Use binary connection for RQ
-    serializer=JSONSerializer
-)
+transaction_queues = {
+    sla_class: DeadlineQueue(
+        name,
+        connection=redis_conn_rq,  # Use binary connection for RQ
+        serializer=JSONSerializer
+    )
+    for sla_class, name in SLA_QUEUE_NAMES.items()
+}
+transaction_queue = transaction_queues[DEFAULT_SLA_CLASS]
+
+
+def get_queue(sla_class: str = DEFAULT_SLA_CLASS) -> DeadlineQueue:
+    """Get the transaction queue instance of an SLA class."""
+    return transaction_queues[sla_class]
 
 
-def get_queue() -> Queue:
-    """Get the transaction queue instance."""
-    return transaction_queue
+def get_queues() -> list:
+    """Get all transaction queues, most urgent class first."""
+    return list(transaction_queues.values())
 
 
 def get_redis_connection() -> Redis:
@@ -87,21 +105,139 @@ def get_redis_connection_rq() -> Redis:
     return redis_conn_rq
 
 
+class TransactionWorker(Worker):
+    """RQ worker keeping the browsers of its jobs under control.
+
+    Every process started by a job inherits GLIZER_JOB_ID and
+    GLIZER_WORKER_NAME, so whatever the job leaves behind (Chrome and
+    chromedriver after a timeout or a crashed work horse) is found and killed
+    when the job ends, and again when the worker exits. The peak memory and
+    CPU time of each job's process tree are stored in ``job.meta["resources"]``.
+    In CHROME_MODE=shared the renderers belong to the shared Chrome, not to
+    the job, so only the work horse and chromedriver are counted
+    (``browser_included`` is False).
+    No job is taken while available memory is below WORKER_MIN_FREE_MEMORY_MB.
+    """
+
+    memory_check_interval = 5
+
+    def perform_job(self, job, queue):
+        # Runs in the work horse: tag the processes the job starts
+        os.environ[JOB_TAG] = job.id
+        os.environ[WORKER_TAG] = self.name
+        sampler = ResourceSampler().start()
+        try:
+            with log_context(job_id=job.id, tx_id=job.args[0] if job.args else None):
+                return super().perform_job(job, queue)
+        finally:
+            usage = sampler.stop()
+            usage["browser_included"] = get_chrome_mode() != "shared"
+            usage["reaped_processes"] = reap_tagged_processes(JOB_TAG, job.id)
+            if usage["reaped_processes"]:
+                logger.warning("Job %s left %s processes running, killed them", job.id, usage["reaped_processes"])
+            logger.info(
+                "Job %s used %s MB peak RSS and %s s CPU", job.id, usage["peak_rss_mb"], usage["cpu_seconds"]
+            )
+            try:
+                job.meta["resources"] = usage
+                job.save_meta()
+            except Exception as e:
+                logger.warning("Failed to save resource usage of job %s: %s", job.id, e)
+            os.environ.pop(JOB_TAG, None)
+            if self.is_horse:
+                # The horse leaves with os._exit(), write out its records first
+                flush_logging()
+
+    def execute_job(self, job, queue):
+        try:
+            super().execute_job(job, queue)
+        finally:
+            # The work horse may have been killed before cleaning up
+            reaped = reap_tagged_processes(JOB_TAG, job.id)
+            if reaped:
+                logger.warning("Killed %s processes left by job %s", reaped, job.id)
+
+    def dequeue_job_and_maintain_ttl(self, timeout, max_idle_time=None):
+        min_free_mb = float(os.getenv("WORKER_MIN_FREE_MEMORY_MB", "512"))
+        while (available_mb := get_available_memory_mb()) < min_free_mb:
+            if self._stop_requested:
+                return None
+            logger.warning(
+                "Only %.0f MB of memory available (< %.0f MB), not taking new jobs", available_mb, min_free_mb
+            )
+            self.heartbeat()
+            time.sleep(self.memory_check_interval)
+        return super().dequeue_job_and_maintain_ttl(timeout, max_idle_time)
+
+    def teardown(self):
+        super().teardown()
+        if not self.is_horse:
+            reaped = reap_tagged_processes(WORKER_TAG, self.name)
+            if reaped:
+                logger.warning("Killed %s processes left by worker %s", reaped, self.name)
+            # Pool workers exit without running atexit handlers
+            flush_logging()
+
+
+def _get_worker_concurrency() -> int:
+    """Get the number of jobs processed in parallel by this worker."""
+    return max(1, int(os.getenv("WORKER_CONCURRENCY", "1")))
+
+
 def start_worker():
-    """Start RQ worker to process transaction jobs."""
+    """Start RQ worker to process transaction jobs.
+
+    With CHROME_MODE=shared a single Chrome process is launched here (unless
+    CHROME_DEBUGGER_ADDRESS points to an external one) and every job runs in
+    its own isolated context of it, so WORKER_CONCURRENCY jobs can run in
+    parallel without one browser per job. A watchdog thread relaunches that
+    Chrome every SHARED_CHROME_CHECK_SECONDS if it died.
+    """
     logger.info("Starting RQ worker for transaction processing...")
+    shared_chrome = None
+    watchdog_stopped = threading.Event()
     try:
-        # Use the RQ-specific Redis connection and JSONSerializer
-        worker = Worker(
-            [transaction_queue], 
-            connection=redis_conn_rq,
-            serializer=JSONSerializer
-        )
-        logger.info(f"Worker initialized with queue: {transaction_queue.name}")
-        worker.work()
+        if get_chrome_mode() == "shared" and not os.getenv("CHROME_DEBUGGER_ADDRESS"):
+            shared_chrome = start_shared_chrome()
+            logger.info("Shared Chrome started at %s", shared_chrome.address)
+            threading.Thread(
+                target=shared_chrome.watch,
+                args=(watchdog_stopped, float(os.getenv("SHARED_CHROME_CHECK_SECONDS", "5"))),
+                name="shared-chrome-watchdog",
+                daemon=True,
+            ).start()
+
+        concurrency = _get_worker_concurrency()
+        queue_names = ", ".join(queue.name for queue in get_queues())
+        if concurrency > 1:
+            pool = WorkerPool(
+                get_queues(),
+                connection=redis_conn_rq,
+                num_workers=concurrency,
+                serializer=JSONSerializer,
+                queue_class=DeadlineQueue,
+                worker_class=TransactionWorker
+            )
+            logger.info("Worker pool initialized with %s workers on queues: %s", concurrency, queue_names)
+            pool.start(burst=False)
+        else:
+            # Use the RQ-specific Redis connection and JSONSerializer,
+            # jobs are dequeued earliest-deadline-first across the SLA queues
+            worker = TransactionWorker(
+                get_queues(), 
+                connection=redis_conn_rq,
+                serializer=JSONSerializer,
+                queue_class=DeadlineQueue
+            )
+            logger.info("Worker initialized with queues: %s", queue_names)
+            worker.work()
     except Exception as e:
-        logger.error(f"Worker failed: {str(e)}")
+        logger.error("Worker failed: %s", e)
         raise
+    finally:
+        watchdog_stopped.set()
+        if shared_chrome:
+            shared_chrome.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,133 @@
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+
+from .service import yalla_pay_recharge
+
+
+class TerminalRechargeError(Exception):
+    """Raised by a backend when retrying the recharge cannot succeed."""
+
+
+class RechargeBackend(ABC):
+    """Interface every recharge backend implements.
+
+    ``recharge`` returns True on success and False on a transient failure
+    (the job is retried by RQ). Failures that must not be retried raise
+    ``TerminalRechargeError``.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def recharge(self, amount, itemType, playerId, pinCode) -> bool:
+        """Recharge ``amount`` of ``itemType`` for ``playerId`` with the gift card ``pinCode``."""
+
+
+class SeleniumRechargeBackend(RechargeBackend):
+    """Performs the real recharge on YallaPay with Chrome."""
+
+    name = "selenium"
+
+    def recharge(self, amount, itemType, playerId, pinCode) -> bool:
+        return yalla_pay_recharge(
+            amount=amount,
+            itemType=itemType,
+            playerId=playerId,
+            pinCode=pinCode,
+        )
+
+
+def parse_latency(spec: str):
+    """Build a latency sampler from a spec string.
+
+    Supported specs (all values in seconds):
+        fixed:5              - always 5s
+        uniform:2,8          - uniformly between 2s and 8s
+        normal:10,2          - mean 10s, standard deviation 2s
+        lognormal:2.3,0.4    - mu/sigma of the underlying normal distribution
+        exponential:5        - mean 5s
+
+    Returns:
+        callable: ``sampler(rng) -> float`` never returning a negative value.
+    """
+    kind, _, raw_args = spec.partition(":")
+    try:
+        values = [float(v) for v in raw_args.split(",")] if raw_args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency spec: {spec!r}")
+
+    samplers = {
+        "fixed": (1, lambda rng, a: a[0]),
+        "uniform": (2, lambda rng, a: rng.uniform(a[0], a[1])),
+        "normal": (2, lambda rng, a: rng.gauss(a[0], a[1])),
+        "lognormal": (2, lambda rng, a: rng.lognormvariate(a[0], a[1])),
+        "exponential": (1, lambda rng, a: rng.expovariate(1 / a[0]) if a[0] else 0.0),
+    }
+    if kind not in samplers or len(values) != samplers[kind][0]:
+        raise ValueError(f"Invalid latency spec: {spec!r}")
+
+    draw = samplers[kind][1]
+    return lambda rng: max(0.0, draw(rng, values))
+
+
+class SimulatedRechargeBackend(RechargeBackend):
+    """Browser-free backend for exercising the queue, DB and webhook layers.
+
+    Each call sleeps for a latency drawn from the configured distribution and
+    then succeeds, fails transiently or fails terminally according to the
+    configured rates.
+    """
+
+    name = "simulated"
+
+    def __init__(
+        self,
+        latency: str = "fixed:0",
+        transient_failure_rate: float = 0.0,
+        terminal_failure_rate: float = 0.0,
+        seed=None,
+    ):
+        if transient_failure_rate < 0 or terminal_failure_rate < 0 or transient_failure_rate + terminal_failure_rate > 1:
+            raise ValueError("Failure rates must be >= 0 and sum to at most 1")
+        self.latency = parse_latency(latency)
+        self.transient_failure_rate = transient_failure_rate
+        self.terminal_failure_rate = terminal_failure_rate
+        self.rng = random.Random(seed)
+
+    def recharge(self, amount, itemType, playerId, pinCode) -> bool:
+        delay = self.latency(self.rng)
+        if delay:
+            time.sleep(delay)
+
+        roll = self.rng.random()
+        if roll < self.terminal_failure_rate:
+            raise TerminalRechargeError(f"Simulated terminal failure for player {playerId}")
+        return roll >= self.terminal_failure_rate + self.transient_failure_rate
+
+
+def _create_backend_from_env() -> RechargeBackend:
+    name = os.getenv("RECHARGE_BACKEND", "selenium").lower()
+    if name == "selenium":
+        return SeleniumRechargeBackend()
+    if name == "simulated":
+        seed = os.getenv("SIMULATED_SEED")
+        return SimulatedRechargeBackend(
+            latency=os.getenv("SIMULATED_LATENCY", "uniform:15,25"),
+            transient_failure_rate=float(os.getenv("SIMULATED_TRANSIENT_FAILURE_RATE", "0")),
+            terminal_failure_rate=float(os.getenv("SIMULATED_TERMINAL_FAILURE_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+    raise ValueError(f"Unknown RECHARGE_BACKEND: {name}")
+
+
+_backend = None
+
+
+def get_recharge_backend() -> RechargeBackend:
+    """Get the recharge backend selected by the RECHARGE_BACKEND env variable."""
+    global _backend
+    if _backend is None:
+        _backend = _create_backend_from_env()
+    return _backend
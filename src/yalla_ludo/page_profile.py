@@ -0,0 +1,110 @@
+import json
+import os
+from dataclasses import dataclass, field, replace
+from typing import Tuple
+
+# Resource types the recharge flow never looks at
+IMAGE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.ico", "*.bmp")
+FONT_PATTERNS = ("*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot")
+MEDIA_PATTERNS = ("*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m3u8")
+
+# Analytics and third-party tags loaded by the recharge page
+THIRD_PARTY_PATTERNS = (
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*connect.facebook.net*",
+    "*facebook.com/tr*",
+    "*analytics.tiktok.com*",
+    "*hotjar.com*",
+    "*clarity.ms*",
+    "*sentry.io*",
+)
+
+
+@dataclass(frozen=True)
+class PageLoadProfile:
+    """How much of the recharge page Chrome is allowed to load and render."""
+
+    name: str
+    page_load_strategy: str = "normal"
+    window_size: Tuple[int, int] = (1920, 1080)
+    block_images: bool = False
+    blocked_url_patterns: Tuple[str, ...] = field(default_factory=tuple)
+    collect_metrics: bool = True
+
+    def chrome_prefs(self) -> dict:
+        """Chrome preferences implementing the profile."""
+        if not self.block_images:
+            return {}
+        # 2 = block
+        return {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.default_content_setting_values.notifications": 2,
+            "profile.default_content_setting_values.media_stream": 2,
+            "profile.default_content_setting_values.geolocation": 2,
+        }
+
+
+PROFILES = {
+    # Everything enabled, matches a regular desktop browser
+    "full": PageLoadProfile(name="full"),
+    # Only the DOM and scripts the flow needs, rendered in a small viewport
+    "lean": PageLoadProfile(
+        name="lean",
+        page_load_strategy="eager",
+        window_size=(1024, 768),
+        block_images=True,
+        blocked_url_patterns=IMAGE_PATTERNS + FONT_PATTERNS + MEDIA_PATTERNS + THIRD_PARTY_PATTERNS,
+    ),
+}
+
+
+def get_page_load_profile(name: str = None) -> PageLoadProfile:
+    """Get the page-load profile selected by CHROME_PAGE_PROFILE.
+
+    Extra comma-separated URL patterns from CHROME_BLOCKED_URLS are appended
+    to the profile's block list.
+    """
+    name = (name or os.getenv("CHROME_PAGE_PROFILE", "lean")).lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown CHROME_PAGE_PROFILE: {name}")
+
+    profile = PROFILES[name]
+    extra = tuple(p.strip() for p in os.getenv("CHROME_BLOCKED_URLS", "").split(",") if p.strip())
+    if extra:
+        profile = replace(profile, blocked_url_patterns=profile.blocked_url_patterns + extra)
+    return profile
+
+
+def apply_network_blocking(driver, profile: PageLoadProfile):
+    """Block the profile's URL patterns through the DevTools Network domain."""
+    if not profile.blocked_url_patterns:
+        return
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(profile.blocked_url_patterns)})
+
+
+def collect_transfer_metrics(driver) -> dict:
+    """Summarise network usage from the DevTools performance log.
+
+    Requires the ``goog:loggingPrefs`` performance capability. Reading the log
+    drains it, so call this once per page/job.
+
+    Returns:
+        dict: bytes_transferred, requests and blocked_requests counters.
+    """
+    metrics = {"bytes_transferred": 0, "requests": 0, "blocked_requests": 0}
+    for entry in driver.get_log("performance"):
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        method = message.get("method")
+        if method == "Network.loadingFinished":
+            metrics["requests"] += 1
+            metrics["bytes_transferred"] += int(message["params"].get("encodedDataLength", 0))
+        elif method == "Network.loadingFailed" and message["params"].get("blockedReason"):
+            metrics["blocked_requests"] += 1
+    return metrics
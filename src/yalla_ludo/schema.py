@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import Literal
+from typing import Literal, Optional
+from datetime import datetime
 
+from transaction.schema import SLAClass
 
 
 class YallaLoadRequest(BaseModel):
@@ -9,4 +11,12 @@ class YallaLoadRequest(BaseModel):
     itemType: Literal["diamonds", "golds"]
     amount: int = Field(..., gt=0)
     pinCode: str
-    playerId: str
\ No newline at end of file
+    playerId: str
+
+    # Scheduling options, not part of the order payload
+    deadline: Optional[datetime] = None
+    slaClass: Optional[SLAClass] = None
+
+
+# Fields of YallaLoadRequest that only drive scheduling
+SCHEDULING_FIELDS = {"deadline", "slaClass"}
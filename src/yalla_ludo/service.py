@@ -3,20 +3,33 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+import logging
+import os
 import time
-import random
+from contextlib import contextmanager
 
-def setup_undetectable_chrome(headless: bool = True):
-    """Configure Chrome to be as undetectable as possible.
+from .page_profile import (
+    PageLoadProfile,
+    apply_network_blocking,
+    collect_transfer_metrics,
+    get_page_load_profile,
+)
+from .shared_browser import SharedChrome, get_chrome_mode, is_browser_alive, isolated_context
+from .waits import WaitStrategy
+
+logger = logging.getLogger(__name__)
+
+def build_chrome_options(headless: bool = True, profile: PageLoadProfile = None) -> Options:
+    """Chrome launch options shared by dedicated and shared browsers.
 
     Args:
         headless (bool): Run browser in headless mode (recommended for servers/containers).
+        profile (PageLoadProfile): Page-load profile, defaults to CHROME_PAGE_PROFILE.
 
     Returns:
-        selenium.webdriver.Chrome: Configured Chrome driver.
+        selenium.webdriver.chrome.options.Options: Configured options.
     """
-    import tempfile  # Local import so that the module is only needed when the function is called
-
+    profile = profile or get_page_load_profile()
     options = Options()
 
     # Headless mode to avoid opening a visible window and to prevent profile-lock issues
@@ -24,7 +37,17 @@ def setup_undetectable_chrome(headless: bool = True):
         # The "new" headless mode is preferred for Chrome >= 109, but the classic flag
         # is still accepted by older versions – passing both does not hurt.
         options.add_argument("--headless=new")
-        options.add_argument("--window-size=1920,1080")
+        options.add_argument("--window-size=%d,%d" % profile.window_size)
+
+    # Don't wait for (or download) resources the flow doesn't use
+    options.page_load_strategy = profile.page_load_strategy
+    prefs = profile.chrome_prefs()
+    if prefs:
+        options.add_experimental_option("prefs", prefs)
+    if profile.block_images:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+    if profile.collect_metrics:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
 
     # Disable automated browser notifications
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
@@ -46,24 +69,65 @@ def setup_undetectable_chrome(headless: bool = True):
     options.add_argument('--lang=fr-FR')
     options.add_argument('--disable-web-security')
     options.add_argument('--allow-running-insecure-content')
-    
-    driver = webdriver.Chrome(options=options)
+
+    return options
+
+def prepare_driver(driver, profile: PageLoadProfile):
+    """Apply network blocking and hide automation traces on the current tab."""
+    apply_network_blocking(driver, profile)
     
     # Hide Selenium properties using JavaScript
     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
     driver.execute_script("Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]})")
     driver.execute_script("Object.defineProperty(navigator, 'languages', {get: () => ['fr-FR', 'fr']})")
-    
+
+def setup_undetectable_chrome(headless: bool = True, profile: PageLoadProfile = None):
+    """Configure Chrome to be as undetectable as possible.
+
+    Args:
+        headless (bool): Run browser in headless mode (recommended for servers/containers).
+        profile (PageLoadProfile): Page-load profile, defaults to CHROME_PAGE_PROFILE.
+
+    Returns:
+        selenium.webdriver.Chrome: Configured Chrome driver.
+    """
+    profile = profile or get_page_load_profile()
+    driver = webdriver.Chrome(options=build_chrome_options(headless, profile))
+    prepare_driver(driver, profile)
     return driver
 
-def human_wait(min_sec=0.5, max_sec=1.5):
-    time.sleep(random.uniform(min_sec, max_sec))
+def start_shared_chrome(headless: bool = True, profile: PageLoadProfile = None) -> SharedChrome:
+    """Launch the Chrome process used by CHROME_MODE=shared workers."""
+    chrome = SharedChrome(build_chrome_options(headless, profile))
+    chrome.start()
+    return chrome
 
-def human_type(element, text):
-    """Type text in a human-like manner"""
-    for char in text:
-        element.send_keys(char)
-        time.sleep(random.uniform(0.1, 0.3))
+@contextmanager
+def open_recharge_browser(profile: PageLoadProfile):
+    """Yield a driver for one recharge and tear it down afterwards.
+
+    In shared mode the job gets an isolated context (own cookies and storage)
+    in the Chrome instance at CHROME_DEBUGGER_ADDRESS; otherwise a dedicated
+    Chrome process is launched and quit.
+    """
+    address = os.getenv("CHROME_DEBUGGER_ADDRESS")
+    if get_chrome_mode() == "shared":
+        if address and is_browser_alive(address):
+            with isolated_context(address, profile, prepare=lambda d: prepare_driver(d, profile)) as driver:
+                yield driver
+            return
+        if address:
+            # Crashed, the worker relaunches it; don't fail the job meanwhile
+            logger.warning("Shared Chrome at %s is not responding, using a dedicated Chrome", address)
+        else:
+            # E.g. started with the `rq worker` CLI instead of worker.py, which launches the shared Chrome
+            logger.warning("CHROME_MODE=shared but CHROME_DEBUGGER_ADDRESS is not set, using a dedicated Chrome")
+
+    driver = setup_undetectable_chrome(profile=profile)
+    try:
+        yield driver
+    finally:
+        driver.quit()
 
 def check_payment_result(driver, timeout=5):
     """
@@ -80,13 +144,46 @@ def check_payment_result(driver, timeout=5):
             EC.presence_of_element_located((By.XPATH, "//p[contains(text(), 'تم إعادة الشحن بنجاح')]"))
         )
         
-        print("✅ PAIEMENT RÉUSSI!")
+        logger.info("Paiement réussi")
         return True
             
     except Exception as e:
-        print("❌ ÉCHEC DU PAIEMENT")
+        logger.warning("Échec du paiement")
         return False
 
+def report_page_metrics(driver, profile, page_ready):
+    """Log the bytes transferred and page-ready time of a recharge job."""
+    try:
+        metrics = collect_transfer_metrics(driver)
+    except Exception as e:
+        logger.warning("Impossible de lire les métriques réseau: %s", e)
+        return
+    logger.info(
+        "Profil %s: page prête en %s, %.1f KB transférés, %s requêtes, %s bloquées",
+        profile.name,
+        f"{page_ready:.2f}s" if page_ready is not None else "n/a",
+        metrics["bytes_transferred"] / 1024,
+        metrics["requests"],
+        metrics["blocked_requests"],
+        extra={"fields": {"profile": profile.name, "page_ready_s": page_ready, **metrics}},
+    )
+
+def report_step_timings(waits):
+    """Log how long each step took and an estimate of the fixed sleep it no longer pays."""
+    steps = waits.report()
+    saved = round(waits.total_estimated_saved(), 2)
+    logger.info(
+        "Étapes (profil %s): %s | temps économisé estimé: %ss",
+        waits.profile.name,
+        ", ".join(
+            f"{row['step']}{' ÉCHEC' if row['failed'] else ''} {row['elapsed_s']:.2f}s "
+            f"(gain estimé {row['est_saved_s']:.2f}s)"
+            for row in steps
+        ),
+        saved,
+        extra={"fields": {"profile": waits.profile.name, "steps": steps, "est_saved_s": saved}},
+    )
+
 def yalla_pay_recharge(amount, itemType, playerId, pinCode):
     """
     Performs a recharge on YallaPay
@@ -100,107 +197,120 @@ def yalla_pay_recharge(amount, itemType, playerId, pinCode):
     Returns:
         bool: True on success, False on failure
     """
-    print(f"Recharging {amount} {itemType} for player {playerId} with pin {pinCode}")
+    # Never log the PIN itself
+    logger.info("Recharging %s %s for player %s", amount, itemType, playerId)
     
-    # time.sleep(5)
-    # return bool(amount % 2)
+    profile = get_page_load_profile()
+    with open_recharge_browser(profile) as driver:
+        return run_recharge_flow(driver, profile, amount, itemType, playerId, pinCode)
+
+def run_recharge_flow(driver, profile, amount, itemType, playerId, pinCode):
+    """
+    Drives the recharge page in an already opened browser
     
-    driver = setup_undetectable_chrome()
+    Returns:
+        bool: True on success, False on failure
+    """
+    waits = WaitStrategy(driver)
+    page_ready = None
     
     try:
-        driver.get('https://www.yallapay.live/recharge?fAppType=20')
-        
-        # Wait a bit for the page to fully load
-        human_wait(2, 4)
-
-        try:
-            close_cookie = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, ".close.cookie-close-rtl"))
-            )
-            close_cookie.click()
-        except:
-            pass
+        with waits.step("open_page"):
+            started = time.monotonic()
+            driver.get('https://www.yallapay.live/recharge?fAppType=20')
+            page_ready = time.monotonic() - started
+            waits.network_idle()
 
-        human_wait()
+        with waits.step("cookie_banner"):
+            try:
+                close_cookie = waits.until(
+                    EC.element_to_be_clickable((By.CSS_SELECTOR, ".close.cookie-close-rtl"))
+                )
+                close_cookie.click()
+            except:
+                pass
 
-        # ID input field with human typing
-        champ = WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.ID, 'checkUserInput'))
-        )
-        
-        human_type(champ, playerId)
-        human_wait()
+        # ID input field
+        with waits.step("player_id"):
+            champ = waits.until(
+                EC.element_to_be_clickable((By.ID, 'checkUserInput'))
+            )
+            waits.type(champ, playerId)
 
         # OK button
-        ok_btn = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located(
-                (By.XPATH, "//button[contains(@class, 'actionbtn') and .//span[text()='حسناً']]")
+        with waits.step("confirm_player"):
+            ok_btn = waits.until(
+                EC.presence_of_element_located(
+                    (By.XPATH, "//button[contains(@class, 'actionbtn') and .//span[text()='حسناً']]")
+                )
             )
-        )
-        driver.execute_script("arguments[0].click();", ok_btn)
-        human_wait()
+            driver.execute_script("arguments[0].click();", ok_btn)
 
-        # Gift button
-        gift_btn = driver.find_element(
-            By.XPATH,
-            "//div[contains(@class, 'cursor-pointer') and .//p[text()='بطاقة الهدية']]"
-        )
-        driver.execute_script("arguments[0].click();", gift_btn)
-        human_wait()
+        # Gift button, rendered once the player is verified
+        with waits.step("gift_card"):
+            gift_btn = waits.until(
+                EC.element_to_be_clickable(
+                    (By.XPATH, "//div[contains(@class, 'cursor-pointer') and .//p[text()='بطاقة الهدية']]")
+                )
+            )
+            driver.execute_script("arguments[0].click();", gift_btn)
 
         # Choose 'diamonds' or 'golds'
-        if itemType == "diamonds":
-            btn = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//section[.//span[contains(text(), 'الماس ')]]"))
-            )
-            driver.execute_script("arguments[0].click();", btn)
-        else:
-            btn = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'قطع ذهبية ') and not(contains(@class, 'pointer-events-none'))]"))
-            )
+        with waits.step("item_type"):
+            if itemType == "diamonds":
+                btn = waits.until(
+                    EC.element_to_be_clickable((By.XPATH, "//section[.//span[contains(text(), 'الماس ')]]"))
+                )
+            else:
+                btn = waits.until(
+                    EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'قطع ذهبية ') and not(contains(@class, 'pointer-events-none'))]"))
+                )
             driver.execute_script("arguments[0].click();", btn)
-
-        human_wait(3, 6)
+            # Let the amounts section load
+            waits.network_idle()
 
         # Select USD amount
-        btn_usd = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable(
-                (By.XPATH, f"//p[contains(text(), 'USD {amount}')]")
+        with waits.step("amount"):
+            btn_usd = waits.until(
+                EC.element_to_be_clickable(
+                    (By.XPATH, f"//p[contains(text(), 'USD {amount}')]")
+                )
             )
-        )
-        btn_usd.click()
-        human_wait()
+            btn_usd.click()
 
-        # Enter PIN with human typing
-        pin_input = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "pincodeTarget"))
-        )
-        human_type(pin_input, pinCode)
-        human_wait()
+        # Enter PIN
+        with waits.step("pin_code"):
+            pin_input = waits.until(
+                EC.element_to_be_clickable((By.ID, "pincodeTarget"))
+            )
+            waits.type(pin_input, pinCode)
 
         # Scroll and pay
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        human_wait()
+        with waits.step("scroll"):
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
 
-        pay_btn = WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located(
-                (By.XPATH, "//button[contains(@class, 'actionbtn') and .//span[text()='الدفع الان']]")
+        with waits.step("pay"):
+            pay_btn = waits.until(
+                EC.presence_of_element_located(
+                    (By.XPATH, "//button[contains(@class, 'actionbtn') and .//span[text()='الدفع الان']]")
+                )
             )
-        )
-        driver.execute_script("arguments[0].click();", pay_btn)
+            driver.execute_script("arguments[0].click();", pay_btn)
         
-        print("🔄 Paiement initié... Vérification du résultat...")
+        logger.info("Paiement initié... Vérification du résultat...")
         
-        # Check the payment result with a 15-second timeout
-        result = check_payment_result(driver, timeout=15)
+        with waits.step("result"):
+            result = check_payment_result(driver, timeout=waits.profile.timeout("result"))
         
         return result
         
     except Exception as e:
-        print(f"❌ Erreur durant le processus: {str(e)}")
+        logger.exception("Erreur durant le processus: %s", e)
         return False
     finally:
-        driver.quit()
+        report_step_timings(waits)
+        if profile.collect_metrics:
+            report_page_metrics(driver, profile, page_ready)
 
 # Test in the main block
 if __name__ == "__main__":
@@ -0,0 +1,227 @@
+import itertools
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+import websocket
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from .page_profile import PageLoadProfile
+
+logger = logging.getLogger(__name__)
+
+
+def get_chrome_mode() -> str:
+    """Browser execution mode: "dedicated" (one Chrome per job) or "shared"."""
+    mode = os.getenv("CHROME_MODE", "dedicated").lower()
+    if mode not in ("dedicated", "shared"):
+        raise ValueError(f"Unknown CHROME_MODE: {mode}")
+    return mode
+
+
+def is_browser_alive(address: str, timeout: float = 2) -> bool:
+    """Whether a Chrome debugger answers at ``address`` (host:port)."""
+    try:
+        return requests.get(f"http://{address}/json/version", timeout=timeout).ok
+    except requests.RequestException:
+        return False
+
+
+def _nest_prefs(prefs: dict) -> dict:
+    """Turn dotted Chrome preference names into the nested Preferences layout."""
+    nested = {}
+    for key, value in prefs.items():
+        node = nested
+        *parents, leaf = key.split(".")
+        for part in parents:
+            node = node.setdefault(part, {})
+        node[leaf] = value
+    return nested
+
+
+class SharedChrome:
+    """A single Chrome process serving several recharges in isolated contexts.
+
+    The process is started with remote debugging enabled. Jobs attach to it
+    through ``isolated_context`` using the debugger address, which is also
+    exported as CHROME_DEBUGGER_ADDRESS so forked work horses can find it.
+    ``watch`` relaunches it on the same port if it dies or stops answering,
+    so the address known to already running worker processes stays valid.
+    """
+
+    def __init__(self, options: Options, binary: str = None):
+        self.options = options
+        self.binary = binary or os.getenv("CHROME_BINARY", "google-chrome")
+        self.process = None
+        self.user_data_dir = None
+        self.address = None
+
+    def start(self, timeout: float = 30, port: int = 0) -> str:
+        self.user_data_dir = tempfile.mkdtemp(prefix="shared-chrome-")
+
+        prefs = self.options.experimental_options.get("prefs")
+        if prefs:
+            os.makedirs(os.path.join(self.user_data_dir, "Default"))
+            with open(os.path.join(self.user_data_dir, "Default", "Preferences"), "w") as fh:
+                json.dump(_nest_prefs(prefs), fh)
+
+        args = [
+            self.binary,
+            *self.options.arguments,
+            f"--remote-debugging-port={port}",
+            f"--user-data-dir={self.user_data_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+            "about:blank",
+        ]
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # Chrome writes its port to DevToolsActivePort (a free one with port 0)
+        port_file = os.path.join(self.user_data_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Shared Chrome exited with code {self.process.returncode}")
+            if os.path.exists(port_file):
+                with open(port_file) as fh:
+                    port = fh.readline().strip()
+                if port:
+                    self.address = f"127.0.0.1:{port}"
+                    os.environ["CHROME_DEBUGGER_ADDRESS"] = self.address
+                    return self.address
+            time.sleep(0.1)
+
+        self.stop()
+        raise RuntimeError("Timed out waiting for shared Chrome to start")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None and is_browser_alive(self.address)
+
+    def ensure_running(self) -> bool:
+        """Relaunch Chrome if it died or hangs.
+
+        Returns:
+            bool: Whether it had to be relaunched.
+        """
+        if self.is_alive():
+            return False
+        logger.warning("Shared Chrome at %s is not responding, relaunching it", self.address)
+        port = int(self.address.rpartition(":")[2]) if self.address else 0
+        self.stop()
+        try:
+            self.start(port=port)
+        except RuntimeError:
+            if not port:
+                raise
+            # Port taken in the meantime: only new work horses get the new address
+            self.start()
+        logger.info("Shared Chrome relaunched at %s", self.address)
+        return True
+
+    def watch(self, stopped: threading.Event, interval: float = 5):
+        """Keep Chrome running until ``stopped`` is set (run in a thread)."""
+        while not stopped.wait(interval):
+            try:
+                self.ensure_running()
+            except Exception as e:
+                logger.error("Failed to relaunch shared Chrome: %s", e)
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+        if os.environ.get("CHROME_DEBUGGER_ADDRESS") == self.address:
+            del os.environ["CHROME_DEBUGGER_ADDRESS"]
+
+
+class BrowserSession:
+    """Minimal DevTools client connected to the browser target."""
+
+    def __init__(self, address: str, timeout: float = 30):
+        version = requests.get(f"http://{address}/json/version", timeout=timeout).json()
+        self.ws = websocket.create_connection(
+            version["webSocketDebuggerUrl"], timeout=timeout, suppress_origin=True
+        )
+        self._ids = itertools.count(1)
+
+    def send(self, method: str, params: dict = None) -> dict:
+        message_id = next(self._ids)
+        self.ws.send(json.dumps({"id": message_id, "method": method, "params": params or {}}))
+        while True:
+            message = json.loads(self.ws.recv())
+            # Skip events and replies to other commands
+            if message.get("id") != message_id:
+                continue
+            if "error" in message:
+                raise RuntimeError(f"{method} failed: {message['error'].get('message')}")
+            return message.get("result", {})
+
+    def close(self):
+        self.ws.close()
+
+
+@contextmanager
+def isolated_context(address: str, profile: PageLoadProfile, prepare=None):
+    """Open a tab in a fresh browser context of the shared Chrome.
+
+    Each context has its own cookies, storage and cache. It is created over a
+    dedicated DevTools connection with ``disposeOnDetach`` so Chrome throws it
+    away even if the job dies before the cleanup below runs; sibling contexts
+    are unaffected.
+
+    Args:
+        address (str): host:port of the shared Chrome debugger.
+        profile (PageLoadProfile): Page-load profile of the job.
+        prepare (callable): Optional ``prepare(driver)`` hook run on the new tab.
+
+    Yields:
+        selenium.webdriver.Chrome: Driver attached to the context's tab.
+    """
+    browser = BrowserSession(address)
+    driver = None
+    context_id = None
+    try:
+        context_id = browser.send("Target.createBrowserContext", {"disposeOnDetach": True})["browserContextId"]
+        target_id = browser.send(
+            "Target.createTarget", {"url": "about:blank", "browserContextId": context_id}
+        )["targetId"]
+
+        # Launch flags, prefs and switches belong to the shared process,
+        # chromedriver rejects them when attaching
+        options = Options()
+        options.debugger_address = address
+        options.page_load_strategy = profile.page_load_strategy
+        if profile.collect_metrics:
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        driver = webdriver.Chrome(options=options)
+        driver.switch_to.window(target_id)
+
+        if prepare:
+            prepare(driver)
+        yield driver
+    finally:
+        if driver is not None:
+            # Attached sessions only detach, the shared browser keeps running
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        if context_id is not None:
+            try:
+                browser.send("Target.disposeBrowserContext", {"browserContextId": context_id})
+            except Exception:
+                pass
+        browser.close()
@@ -0,0 +1,202 @@
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Dict, Tuple
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from logging_setup import log_context
+
+# Seconds each step may wait for its DOM condition
+DEFAULT_STEP_TIMEOUTS = {
+    "open_page": 20,
+    "cookie_banner": 10,
+    "player_id": 20,
+    "confirm_player": 10,
+    "gift_card": 10,
+    "item_type": 10,
+    "amount": 10,
+    "pin_code": 10,
+    "pay": 5,
+    "result": 15,
+}
+
+# Network is considered idle after this long without a new request
+NETWORK_QUIET_SECONDS = 0.5
+
+
+@dataclass(frozen=True)
+class WaitProfile:
+    """Timing behaviour of the recharge flow.
+
+    ``pauses`` are extra random sleeps (min, max) taken after a step on top of
+    its DOM condition, ``keystroke_delay`` is the per-character typing delay.
+    A profile without pauses or keystroke delay only waits for the page.
+    """
+
+    name: str
+    pauses: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    default_pause: Tuple[float, float] = (0.0, 0.0)
+    keystroke_delay: Tuple[float, float] = (0.0, 0.0)
+    wait_network_idle: bool = True
+    step_timeouts: Dict[str, float] = field(default_factory=dict)
+
+    def pause_range(self, step: str) -> Tuple[float, float]:
+        return self.pauses.get(step, self.default_pause)
+
+    def timeout(self, step: str) -> float:
+        return self.step_timeouts.get(step, DEFAULT_STEP_TIMEOUTS.get(step, 10))
+
+    def expected_sleep(self, step: str, typed_chars: int = 0) -> float:
+        """Average fixed sleep this profile spends on a step."""
+        low, high = self.pause_range(step)
+        key_low, key_high = self.keystroke_delay
+        return (low + high) / 2 + typed_chars * (key_low + key_high) / 2
+
+
+WAIT_PROFILES = {
+    # The original fixed sleeps and per-character typing
+    "human": WaitProfile(
+        name="human",
+        pauses={"open_page": (2, 4), "item_type": (3, 6), "pay": (0, 0), "result": (0, 0)},
+        default_pause=(0.5, 1.5),
+        keystroke_delay=(0.1, 0.3),
+        wait_network_idle=False,
+    ),
+    # Condition-driven with a little jitter between steps
+    "balanced": WaitProfile(
+        name="balanced",
+        pauses={"pay": (0, 0), "result": (0, 0)},
+        default_pause=(0.1, 0.4),
+        keystroke_delay=(0.02, 0.06),
+        step_timeouts={"cookie_banner": 3},
+    ),
+    # Condition-driven only
+    "fast": WaitProfile(
+        name="fast",
+        step_timeouts={"cookie_banner": 3},
+    ),
+}
+
+# Baseline used to report the time saved per step
+LEGACY_PROFILE = WAIT_PROFILES["human"]
+
+
+def get_wait_profile(name: str = None) -> WaitProfile:
+    """Get the wait profile selected by RECHARGE_WAIT_PROFILE.
+
+    Per-step timeouts can be overridden with RECHARGE_STEP_TIMEOUTS, a JSON
+    object such as ``{"player_id": 30, "result": 20}``.
+    """
+    name = (name or os.getenv("RECHARGE_WAIT_PROFILE", "fast")).lower()
+    if name not in WAIT_PROFILES:
+        raise ValueError(f"Unknown RECHARGE_WAIT_PROFILE: {name}")
+
+    profile = WAIT_PROFILES[name]
+    overrides = os.getenv("RECHARGE_STEP_TIMEOUTS")
+    if overrides:
+        timeouts = dict(profile.step_timeouts)
+        timeouts.update({step: float(value) for step, value in json.loads(overrides).items()})
+        profile = replace(profile, step_timeouts=timeouts)
+    return profile
+
+
+class WaitStrategy:
+    """Runs the recharge steps on DOM conditions and records their timings."""
+
+    def __init__(self, driver, profile: WaitProfile = None):
+        self.driver = driver
+        self.profile = profile or get_wait_profile()
+        self.timings = []
+        self._current = None
+
+    @contextmanager
+    def step(self, name: str):
+        """Time a step; the profile's pause for it is taken on success.
+
+        A step that raises (e.g. its condition timed out) is recorded too,
+        with ``failed`` set.
+        """
+        self._current = {"step": name, "slept": 0.0, "typed": 0, "failed": True}
+        started = time.monotonic()
+        try:
+            with log_context(step=name):
+                yield
+                self._sleep(*self.profile.pause_range(name))
+            self._current["failed"] = False
+        finally:
+            self._current["elapsed"] = time.monotonic() - started
+            self.timings.append(self._current)
+            self._current = None
+
+    def until(self, condition, step: str = None, timeout: float = None):
+        """Wait for ``condition`` with the step's timeout."""
+        step = step or self._current["step"]
+        return WebDriverWait(self.driver, timeout or self.profile.timeout(step)).until(condition)
+
+    def network_idle(self, step: str = None):
+        """Wait until no new resource has been requested for a quiet period.
+
+        Skipped by profiles relying on fixed pauses instead. Never fails: the
+        next DOM condition still guards the flow if the page keeps polling.
+        """
+        if not self.profile.wait_network_idle:
+            return
+        step = step or self._current["step"]
+        deadline = time.monotonic() + self.profile.timeout(step)
+        last_count, quiet_since = -1, time.monotonic()
+        while time.monotonic() < deadline:
+            count, state = self.driver.execute_script(
+                "return [performance.getEntriesByType('resource').length, document.readyState];"
+            )
+            now = time.monotonic()
+            if count != last_count:
+                last_count, quiet_since = count, now
+            elif state != "loading" and now - quiet_since >= NETWORK_QUIET_SECONDS:
+                return
+            time.sleep(0.1)
+
+    def type(self, element, text: str):
+        """Type ``text`` with the profile's keystroke delay (all at once if none)."""
+        low, high = self.profile.keystroke_delay
+        if self._current is not None:
+            self._current["typed"] += len(text)
+        if not high:
+            element.send_keys(text)
+            return
+        for char in text:
+            element.send_keys(char)
+            self._sleep(low, high)
+
+    def _sleep(self, low: float, high: float):
+        if not high:
+            return
+        delay = random.uniform(low, high)
+        time.sleep(delay)
+        if self._current is not None:
+            self._current["slept"] += delay
+
+    def report(self) -> list:
+        """Per-step timings with an estimate of the sleep saved.
+
+        The estimate is the legacy profile's average sleep for the step minus
+        the sleep actually taken, not a measured comparison: the legacy flow
+        is not run alongside.
+        """
+        rows = []
+        for timing in self.timings:
+            legacy = LEGACY_PROFILE.expected_sleep(timing["step"], timing["typed"])
+            rows.append({
+                "step": timing["step"],
+                "failed": timing["failed"],
+                "elapsed_s": round(timing["elapsed"], 3),
+                "slept_s": round(timing["slept"], 3),
+                "est_saved_s": round(legacy - timing["slept"], 3),
+            })
+        return rows
+
+    def total_estimated_saved(self) -> float:
+        return round(sum(row["est_saved_s"] for row in self.report()), 3)
@@ -0,0 +1,70 @@
+"""
+Test setup: the application is imported straight from ``src`` with RQ backed
+by fakeredis and the transaction DB in a temporary directory, prepared before
+the first ``transaction`` import (see ``benchmarks/harness.py``).
+"""
+
+import os
+import sys
+import tempfile
+
+import fakeredis
+import pytest
+import redis
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+redis.Redis = fakeredis.FakeRedis
+os.environ.update({
+    "BOT_TOKEN": "test-token",
+    "RECHARGE_BACKEND": "simulated",
+    "SIMULATED_LATENCY": "fixed:0",
+    "LOG_LEVEL": "WARNING",
+})
+os.chdir(tempfile.mkdtemp(prefix="glizer-tests-"))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """The transaction service on empty Redis and DB, recording Glizer notifications."""
+    from transaction import service
+    from transaction.worker import get_redis_connection
+
+    get_redis_connection().flushall()
+    db = service.SessionLocal()
+    db.query(service.Transaction).delete()
+    db.commit()
+    db.close()
+
+    service.notifications = []
+    monkeypatch.setattr(service, "notify_glizer", lambda tx_id, status: service.notifications.append((tx_id, status)))
+    return service
+
+
+@pytest.fixture
+def run_worker():
+    """Run every queued job in this process."""
+    from rq import SimpleWorker
+    from rq.serializers import JSONSerializer
+
+    from transaction.scheduling import DeadlineQueue
+    from transaction.worker import get_queues, get_redis_connection_rq
+
+    class BurstWorker(SimpleWorker):
+        # No pubsub thread on the shared fakeredis connection
+        def subscribe(self):
+            pass
+
+        def unsubscribe(self):
+            pass
+
+    def run():
+        worker = BurstWorker(
+            get_queues(), connection=get_redis_connection_rq(), serializer=JSONSerializer, queue_class=DeadlineQueue
+        )
+        worker.work(burst=True, logging_level="WARNING")
+
+    return run
@@ -0,0 +1,97 @@
+import random
+
+import pytest
+from rq.job import Job, JobStatus
+from rq.serializers import JSONSerializer
+
+from test_reconciler import add_transaction, enqueue
+from transaction.worker import get_redis_connection_rq
+from yalla_ludo.backends import RechargeBackend, SimulatedRechargeBackend, TerminalRechargeError, parse_latency
+
+
+def test_backend_must_implement_recharge():
+    class Incomplete(RechargeBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_simulated_backend_succeeds_without_failures():
+    assert SimulatedRechargeBackend(latency="fixed:0").recharge(5, "diamonds", "42", "TEST00000001") is True
+
+
+@pytest.mark.parametrize("spec, low, high", [
+    ("fixed:5", 5, 5),
+    ("uniform:2,8", 2, 8),
+    ("normal:10,2", 0, 30),
+    ("lognormal:2.3,0.4", 0, 100),
+    ("exponential:5", 0, 200),
+    ("exponential:0", 0, 0),
+])
+def test_latency_specs(spec, low, high):
+    sampler = parse_latency(spec)
+    rng = random.Random(1)
+    assert all(low <= sampler(rng) <= high for _ in range(100))
+
+
+def test_latency_is_never_negative():
+    sampler = parse_latency("normal:0,10")
+    rng = random.Random(1)
+    assert min(sampler(rng) for _ in range(100)) == 0
+
+
+@pytest.mark.parametrize("spec", ["", "fixed", "fixed:", "fixed:a", "uniform:2", "fixed:1,2", "gamma:1,2", "5"])
+def test_invalid_latency_specs(spec):
+    with pytest.raises(ValueError, match="Invalid latency spec"):
+        parse_latency(spec)
+
+
+@pytest.mark.parametrize("transient, terminal", [(-0.1, 0), (0, -0.1), (0.6, 0.5), (1.5, 0)])
+def test_invalid_failure_rates(transient, terminal):
+    with pytest.raises(ValueError):
+        SimulatedRechargeBackend(transient_failure_rate=transient, terminal_failure_rate=terminal)
+
+
+def test_seeded_failures_are_reproducible():
+    def outcomes(seed):
+        backend = SimulatedRechargeBackend(transient_failure_rate=0.3, terminal_failure_rate=0.3, seed=seed)
+        results = []
+        for _ in range(50):
+            try:
+                results.append(backend.recharge(5, "diamonds", "42", "TEST00000001"))
+            except TerminalRechargeError:
+                results.append("terminal")
+        return results
+
+    assert outcomes(7) == outcomes(7)
+    assert {True, False, "terminal"} == set(outcomes(7))
+
+
+def test_terminal_failure_raises():
+    backend = SimulatedRechargeBackend(terminal_failure_rate=1.0, seed=1)
+    with pytest.raises(TerminalRechargeError):
+        backend.recharge(5, "diamonds", "42", "TEST00000001")
+
+
+def test_terminal_failure_fails_the_transaction_without_retry(service, run_worker, monkeypatch):
+    class CountingBackend(SimulatedRechargeBackend):
+        calls = 0
+
+        def recharge(self, *args, **kwargs):
+            CountingBackend.calls += 1
+            return super().recharge(*args, **kwargs)
+
+    backend = CountingBackend(terminal_failure_rate=1.0, seed=1)
+    monkeypatch.setattr(service, "get_recharge_backend", lambda: backend)
+    tx_id = add_transaction(service)
+    enqueue(service, tx_id)
+
+    run_worker()
+
+    job = Job.fetch(tx_id, connection=get_redis_connection_rq(), serializer=JSONSerializer)
+    assert job.get_status() == JobStatus.FINISHED
+    assert job.return_value() == "error"
+    assert CountingBackend.calls == 1
+    assert service.get_status(tx_id).status == "error"
+    assert service.notifications == [(tx_id, "error")]
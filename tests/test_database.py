@@ -0,0 +1,41 @@
+import sqlite3
+
+from sqlalchemy import create_engine, inspect
+
+from transaction import database
+from transaction.models import Transaction
+
+# transactions table as created by the first release
+BASELINE_SCHEMA = """
+CREATE TABLE transactions (
+    id VARCHAR NOT NULL PRIMARY KEY,
+    status VARCHAR,
+    order_type VARCHAR,
+    order_payload TEXT,
+    remaining_retries INTEGER
+)
+"""
+
+
+def test_missing_columns_are_added_to_an_existing_database(tmp_path, monkeypatch):
+    path = tmp_path / "transactions.db"
+    with sqlite3.connect(path) as connection:
+        connection.execute(BASELINE_SCHEMA)
+        connection.execute("INSERT INTO transactions VALUES ('old', 'pending', 'yalla_ludo', '{}', 3)")
+    engine = create_engine(f"sqlite:///{path}")
+    monkeypatch.setattr(database, "engine", engine)
+
+    database.init_db()
+    # Running it again on the migrated database is a no-op
+    database.init_db()
+
+    columns = {column["name"] for column in inspect(engine).get_columns("transactions")}
+    assert {"sla_class", "deadline", "created_at", "client_id"} <= columns
+    indexes = {index["name"] for index in inspect(engine).get_indexes("transactions")}
+    assert "ix_transactions_sla_class" in indexes
+    db = database.SessionLocal(bind=engine)
+    try:
+        old = db.query(Transaction).filter(Transaction.sla_class.is_(None)).one()
+        assert (old.id, old.status, old.client_id) == ("old", "pending", None)
+    finally:
+        db.close()
@@ -0,0 +1,164 @@
+import threading
+import time
+
+import pytest
+
+from transaction import fair_queue
+from transaction.fair_queue import FairDispatcher
+from transaction.worker import get_redis_connection
+
+
+def make_dispatcher(capacity: int = 100, weights: dict = None, max_expired: int = 100):
+    dispatched, expired = [], []
+    dispatcher = FairDispatcher(
+        get_redis_connection(),
+        dispatch=lambda tx_id, entry: dispatched.append(tx_id),
+        capacity=lambda: capacity,
+        weight=lambda client_id: (weights or {}).get(client_id, 1),
+        expire=lambda tx_id, entry: expired.append(tx_id),
+        max_expired=max_expired,
+    )
+    return dispatcher, dispatched, expired
+
+
+def submit(client_id: str, tx_id: str, deadline_in: float):
+    fair_queue.submit(get_redis_connection(), client_id, tx_id, {"payload": {}}, deadline=time.time() + deadline_in)
+
+
+def test_clients_take_turns(service):
+    for i in range(4):
+        submit("a", f"a{i}", 3600 + i)
+    submit("b", "b0", 3600)
+    dispatcher, dispatched, _ = make_dispatcher()
+    assert dispatcher.dispatch_once() == 5
+    assert dispatched[:3] == ["a0", "b0", "a1"]
+
+
+def test_client_turn_serves_earliest_deadline(service):
+    for i in range(3):
+        submit("a", f"bulk{i}", 7200)
+    submit("a", "express", 300)
+    dispatcher, dispatched, _ = make_dispatcher(capacity=1)
+    dispatcher.dispatch_once()
+    assert dispatched == ["express"]
+    assert fair_queue.queue_depth(get_redis_connection(), "a") == 3
+
+
+def test_expired_orders_use_no_capacity(service):
+    submit("a", "late", -1)
+    submit("a", "on-time", 300)
+    dispatcher, dispatched, expired = make_dispatcher(capacity=1)
+    assert dispatcher.dispatch_once() == 1
+    assert (dispatched, expired) == (["on-time"], ["late"])
+    assert not fair_queue.is_awaiting_dispatch(get_redis_connection(), "late")
+    metrics = fair_queue.get_client_metrics(get_redis_connection(), ["a"])
+    assert metrics["a"]["expired"] == 1
+
+
+def test_expired_backlog_is_drained_over_several_calls(service):
+    for i in range(5):
+        submit("a", f"late{i}", -10 + i)
+    submit("a", "on-time", 300)
+    dispatcher, dispatched, expired = make_dispatcher(max_expired=2)
+    # The on-time order is not held up behind the expired ones
+    assert dispatcher.dispatch_once() == 1
+    assert (dispatched, expired) == (["on-time"], ["late0", "late1"])
+    dispatcher.dispatch_once()
+    dispatcher.dispatch_once()
+    assert expired == [f"late{i}" for i in range(5)]
+    assert fair_queue.queue_depth(get_redis_connection(), "a") == 0
+
+
+def test_expiry_notification_does_not_hold_the_dispatcher(service, monkeypatch):
+    from test_reconciler import add_transaction
+
+    tx_id = add_transaction(service)
+    fair_queue.submit(get_redis_connection(), "default", tx_id, {"payload": {}}, deadline=time.time() - 1)
+    release, notified = threading.Event(), threading.Event()
+
+    def slow_webhook(tx_id, status):
+        release.wait(5)
+        service.notifications.append((tx_id, status))
+        notified.set()
+
+    monkeypatch.setattr(service, "notify_glizer", slow_webhook)
+    assert service.dispatch_pending_orders() == 0
+    assert service.get_status(tx_id).status == "error"
+    assert service.notifications == []
+    release.set()
+    assert notified.wait(5)
+    assert service.notifications == [(tx_id, "error")]
+
+
+def test_pass_lock_is_kept_for_a_long_pass(service):
+    from transaction import reconciler
+
+    connection = get_redis_connection()
+    with reconciler.pass_lock(connection, "test:lock", ttl=1) as acquired:
+        assert acquired
+        time.sleep(1.5)
+        assert connection.exists("test:lock")
+    assert not connection.exists("test:lock")
+
+
+def test_dispatchers_share_the_round(service):
+    for i in range(2):
+        submit("a", f"a{i}", 3600 + i)
+        submit("b", f"b{i}", 3600 + i)
+    first, dispatched, _ = make_dispatcher(capacity=1)
+    second, dispatched_second, _ = make_dispatcher(capacity=1)
+    # Two API processes taking turns continue the same round
+    for dispatcher in (first, second, first, second):
+        dispatcher.dispatch_once()
+    # a0, b0, a1, b1 overall
+    assert (dispatched, dispatched_second) == (["a0", "a1"], ["b0", "b1"])
+
+
+def test_one_process_dispatches_at_a_time(service):
+    from transaction import reconciler
+
+    submit("default", "tx", 3600)
+    with reconciler.pass_lock(get_redis_connection(), fair_queue.DISPATCH_LOCK_KEY):
+        assert service.dispatch_pending_orders() == 0
+    assert fair_queue.queue_depth(get_redis_connection(), "default") == 1
+
+
+def test_metrics_are_limited_to_the_caller(service):
+    from transaction.schema import ApiClient
+
+    submit("a", "a0", 3600)
+    submit("b", "b0", 3600)
+    metrics = service.get_metrics(ApiClient(id="a", token="token-a"))
+    assert list(metrics.clients) == ["a"]
+    assert {"a", "b"} <= set(service.get_metrics().clients)
+
+
+def test_status_is_limited_to_the_caller(service):
+    from test_reconciler import add_transaction
+    from transaction.schema import ApiClient
+
+    tx_id = add_transaction(service)
+    db = service.SessionLocal()
+    db.query(service.Transaction).filter_by(id=tx_id).update({"client_id": "a"})
+    db.commit()
+    db.close()
+
+    assert service.get_status(tx_id, ApiClient(id="a", token="token-a")).status == "pending"
+    assert service.get_status(tx_id, ApiClient(id="default", token="test-token")).status == "pending"
+    with pytest.raises(KeyError):
+        service.get_status(tx_id, ApiClient(id="b", token="token-b"))
+
+
+@pytest.mark.parametrize("fair_dispatch", ["true", "false"])
+def test_quota_is_enforced_with_and_without_fair_dispatch(service, monkeypatch, fair_dispatch):
+    from test_reconciler import PAYLOAD
+    from transaction.schema import ApiClient
+    from yalla_ludo.schema import YallaLoadRequest
+
+    monkeypatch.setenv("FAIR_DISPATCH_ENABLED", fair_dispatch)
+    client = ApiClient(id="a", token="token-a", quota=1)
+    service.create_yalla_transaction(YallaLoadRequest(**PAYLOAD), client)
+    with pytest.raises(service.QuotaExceededError):
+        service.create_yalla_transaction(YallaLoadRequest(**PAYLOAD), client)
+    # Other clients have their own quota
+    service.create_yalla_transaction(YallaLoadRequest(**PAYLOAD), ApiClient(id="b", token="token-b", quota=1))
@@ -0,0 +1,61 @@
+import json
+import logging
+
+import pytest
+
+import logging_setup
+from logging_setup import REDACTED, configure_logging, flush_logging, log_context, redact
+
+
+@pytest.mark.parametrize("text, secret", [
+    ("pinCode=TEST00000001&amount=5", "TEST00000001"),
+    ("pin_code: 'abc123def'", "abc123def"),
+    ('{"token": "s3cr3t-value", "amount": 5}', "s3cr3t-value"),
+    ("Authorization: Bearer eyJhbGciOi.payload", "eyJhbGciOi.payload"),
+    ("entered pin 7K3Q9ZX2 on the form", "7K3Q9ZX2"),
+    ("Recharging card 3J22NN6P16KA for player 42", "3J22NN6P16KA"),
+])
+def test_secrets_are_masked(text, secret):
+    masked = redact(text)
+    assert secret not in masked
+    assert REDACTED in masked
+
+
+def test_known_secret_values_are_masked():
+    assert redact("login as admin/hunter22", secrets={"hunter22"}) == f"login as admin/{REDACTED}"
+
+
+@pytest.mark.parametrize("text", [
+    "Transaction 1f0c2a9e-6d3b-4c57-9a45-2f1e8d7c6b5a completed successfully",
+    "Player 7915329 received 5 diamonds",
+    "Retrying in 30 seconds (attempt 2 of 3)",
+])
+def test_ordinary_messages_are_left_alone(text):
+    assert redact(text) == text
+
+
+@pytest.fixture
+def fresh_logging(monkeypatch):
+    """Let configure_logging set up its pipeline again, then restore the previous one."""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    monkeypatch.setattr(logging_setup, "_handler", None)
+    monkeypatch.setattr(logging_setup, "_listener", None)
+    yield
+    logging_setup._listener.stop()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_logged_pin_is_masked_end_to_end(fresh_logging, capsys, monkeypatch):
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.delenv("LOG_STREAM", raising=False)
+    configure_logging("INFO")
+
+    with log_context(tx_id="tx-1"):
+        logging.getLogger("transaction.service").info("Recharging with PIN %s for player %s", "3J22NN6P16KA", "42")
+    flush_logging()
+
+    entry = json.loads(capsys.readouterr().err.strip().splitlines()[-1])
+    assert entry["message"] == f"Recharging with PIN {REDACTED} for player 42"
+    assert entry["tx_id"] == "tx-1"
@@ -0,0 +1,234 @@
+import time
+import uuid
+from datetime import timedelta
+
+import pytest
+from rq.job import Job, JobStatus
+from rq.serializers import JSONSerializer
+
+from transaction import fair_queue, reconciler
+from transaction.scheduling import utcnow
+from transaction.worker import get_queue, get_queues, get_redis_connection, get_redis_connection_rq
+
+PAYLOAD = {"itemType": "diamonds", "amount": 5, "pinCode": "TEST00000001", "playerId": "42"}
+STALE_AFTER = 60
+
+
+def add_transaction(service, status="pending", age=120, remaining_retries=3) -> str:
+    """Store a transaction created ``age`` seconds ago."""
+    tx_id = str(uuid.uuid4())
+    db = service.SessionLocal()
+    try:
+        db.add(service.Transaction(
+            id=tx_id,
+            status=status,
+            order_type="yalla_ludo",
+            order_payload=service.json.dumps(PAYLOAD),
+            remaining_retries=remaining_retries,
+            sla_class="standard",
+            created_at=utcnow() - timedelta(seconds=age),
+        ))
+        db.commit()
+    finally:
+        db.close()
+    return tx_id
+
+
+def enqueue(service, tx_id: str):
+    return service._enqueue_transaction(
+        service.process_transaction_by_type_job,
+        tx_id,
+        "yalla_ludo",
+        PAYLOAD,
+        sla_class="standard",
+        deadline=None,
+        max_retries=1,
+    )
+
+
+def job_with_status(service, status: JobStatus, **fields) -> str:
+    tx_id = add_transaction(service)
+    job = enqueue(service, tx_id)
+    get_redis_connection_rq().lrem(get_queue("standard").key, 0, tx_id)
+    job.set_status(status)
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.save()
+    return tx_id
+
+
+def job_state(tx_id: str) -> str:
+    queues = {queue.name: queue for queue in get_queues()}
+    state, _ = reconciler.get_job_state(
+        tx_id, queues, get_redis_connection(), get_redis_connection_rq(), JSONSerializer, STALE_AFTER
+    )
+    return state
+
+
+def reconcile(service, tx_id: str, confirm_after: float = 0) -> str:
+    queues = {queue.name: queue for queue in get_queues()}
+    return service._reconcile_transaction(tx_id, queues, get_redis_connection(), confirm_after, STALE_AFTER)
+
+
+def get_status(service, tx_id: str) -> str:
+    return service.get_status(tx_id).status
+
+
+# ---------------------------------------------------------------------------
+# Job classification
+# ---------------------------------------------------------------------------
+
+def test_awaiting_dispatch_is_alive(service):
+    tx_id = add_transaction(service)
+    fair_queue.submit(get_redis_connection(), "default", tx_id, {"payload": PAYLOAD}, deadline=time.time() + 300)
+    assert job_state(tx_id) == reconciler.ALIVE
+
+
+def test_queued_job_is_alive(service):
+    tx_id = add_transaction(service)
+    enqueue(service, tx_id)
+    assert job_state(tx_id) == reconciler.ALIVE
+
+
+def test_missing_job_is_orphaned(service):
+    assert job_state(add_transaction(service)) == reconciler.ORPHANED
+
+
+def test_claimed_but_not_started_job_is_orphaned(service):
+    assert job_state(job_with_status(service, JobStatus.QUEUED)) == reconciler.ORPHANED
+
+
+def test_unreadable_job_is_orphaned(service):
+    tx_id = add_transaction(service)
+    get_redis_connection_rq().hset(Job.key_for(tx_id), "data", b"not json")
+    get_redis_connection_rq().hset(Job.key_for(tx_id), "status", b"queued")
+    state, job = reconciler.get_job_state(
+        tx_id, {}, get_redis_connection(), get_redis_connection_rq(), JSONSerializer, STALE_AFTER
+    )
+    assert state == reconciler.ORPHANED
+    assert job is not None
+
+
+def test_running_job_with_heartbeat_is_alive(service):
+    tx_id = job_with_status(service, JobStatus.STARTED, last_heartbeat=utcnow())
+    assert job_state(tx_id) == reconciler.ALIVE
+
+
+def test_running_job_without_heartbeat_is_orphaned(service):
+    tx_id = job_with_status(
+        service, JobStatus.STARTED, last_heartbeat=utcnow() - timedelta(seconds=STALE_AFTER * 2)
+    )
+    assert job_state(tx_id) == reconciler.ORPHANED
+
+
+@pytest.mark.parametrize("status", [JobStatus.SCHEDULED, JobStatus.DEFERRED])
+def test_waiting_job_is_alive(service, status):
+    assert job_state(job_with_status(service, status)) == reconciler.ALIVE
+
+
+@pytest.mark.parametrize("status", [JobStatus.FAILED, JobStatus.STOPPED, JobStatus.CANCELED])
+def test_failed_job_is_exhausted(service, status):
+    assert job_state(job_with_status(service, status)) == reconciler.EXHAUSTED
+
+
+def test_finished_job_is_finished(service):
+    assert job_state(job_with_status(service, JobStatus.FINISHED)) == reconciler.FINISHED
+
+
+# ---------------------------------------------------------------------------
+# Repairs
+# ---------------------------------------------------------------------------
+
+def test_orphan_is_requeued_once_confirmed(service):
+    tx_id = add_transaction(service)
+
+    assert reconcile(service, tx_id, confirm_after=60) == "suspected"
+    assert get_queue("standard").get_job_position(tx_id) is None
+
+    assert reconcile(service, tx_id) == reconciler.ORPHANED
+    assert get_queue("standard").get_job_position(tx_id) is not None
+    assert service._get_transaction(tx_id).remaining_retries == 2
+    assert get_status(service, tx_id) == "pending"
+
+
+def test_orphan_without_retries_is_failed(service):
+    tx_id = add_transaction(service, remaining_retries=0)
+    reconcile(service, tx_id)
+    assert reconcile(service, tx_id) == reconciler.ORPHANED
+    assert get_status(service, tx_id) == "error"
+    assert service.notifications == [(tx_id, "error")]
+
+
+def test_exhausted_job_fails_transaction(service):
+    tx_id = job_with_status(service, JobStatus.FAILED)
+    assert reconcile(service, tx_id) == reconciler.EXHAUSTED
+    assert get_status(service, tx_id) == "error"
+    assert service.notifications == [(tx_id, "error")]
+
+
+def test_finished_job_outcome_is_recovered(service, run_worker):
+    tx_id = add_transaction(service)
+    enqueue(service, tx_id)
+    run_worker()
+    # Simulate a status save that never made it to the DB
+    db = service.SessionLocal()
+    db.query(service.Transaction).filter_by(id=tx_id).update({"status": "pending"})
+    db.commit()
+    db.close()
+    service.notifications.clear()
+
+    assert reconcile(service, tx_id) == reconciler.FINISHED
+    assert get_status(service, tx_id) == "success"
+    assert service.notifications == [(tx_id, "success")]
+
+
+def test_finished_job_without_outcome_is_left_pending(service):
+    tx_id = job_with_status(service, JobStatus.FINISHED)
+    assert reconcile(service, tx_id) == "unresolved"
+    assert get_status(service, tx_id) == "pending"
+    assert service.notifications == []
+
+
+def test_job_finishing_during_the_pass_is_not_failed(service, run_worker, monkeypatch):
+    tx_id = add_transaction(service)
+    enqueue(service, tx_id)
+    classify = reconciler.get_job_state
+
+    def finish_then_classify(*args, **kwargs):
+        # The job completes after the pass read its batch of pending rows
+        run_worker()
+        return classify(*args, **kwargs)
+
+    monkeypatch.setattr(reconciler, "get_job_state", finish_then_classify)
+    counts = service.reconcile_pending_transactions()
+
+    assert counts == {"settled": 1, "checked": 1}
+    assert get_status(service, tx_id) == "success"
+    assert service.notifications == [(tx_id, "success")]
+
+
+def test_settled_transaction_is_not_overwritten(service, run_worker):
+    tx_id = add_transaction(service, status="success")
+    assert service.update_status(tx_id, "error", notify=True) is False
+    assert get_status(service, tx_id) == "success"
+
+    # A duplicate run of the job does not recharge again
+    enqueue(service, tx_id)
+    run_worker()
+    job = Job.fetch(tx_id, connection=get_redis_connection_rq(), serializer=JSONSerializer)
+    assert job.return_value() == "success"
+    assert service.notifications == []
+
+
+def test_suspects_are_confirmed_on_the_next_pass(service, monkeypatch):
+    monkeypatch.setenv("RECONCILE_BATCH_SIZE", "1")
+    monkeypatch.setenv("RECONCILE_CONFIRM_SECONDS", "0")
+    first = add_transaction(service, age=300)
+    second = add_transaction(service, age=200)
+    add_transaction(service, age=100)
+
+    assert service.reconcile_pending_transactions() == {"suspected": 1, "checked": 1}
+    # The watermark moved on to the second row, the first is still re-checked
+    assert service.reconcile_pending_transactions() == {"orphaned": 1, "suspected": 1, "checked": 1}
+    assert get_queue("standard").get_job_position(first) is not None
+    assert get_queue("standard").get_job_position(second) is None
@@ -0,0 +1,86 @@
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+
+from rq import Retry
+from rq.job import Job
+from rq.serializers import JSONSerializer
+
+from test_reconciler import PAYLOAD, add_transaction
+from transaction.scheduling import DeadlineQueue, deadline_index_key, get_deadline_metrics, utcnow
+from transaction.worker import get_queue, get_queues, get_redis_connection, get_redis_connection_rq
+from yalla_ludo.backends import RechargeBackend, TerminalRechargeError
+
+
+def enqueue(sla_class: str, seconds: int) -> str:
+    job_id = str(uuid.uuid4())
+    get_queue(sla_class).enqueue_with_deadline(
+        "os.getcwd", deadline=utcnow() + timedelta(seconds=seconds), job_id=job_id, retry=Retry(max=1)
+    )
+    return job_id
+
+
+def dequeue() -> str:
+    job, _ = DeadlineQueue.dequeue_any(
+        get_queues(), None, connection=get_redis_connection_rq(), serializer=JSONSerializer
+    )
+    return job.id
+
+
+def test_earliest_deadline_first(service):
+    bulk = enqueue("bulk", 7200)
+    standard = enqueue("standard", 1800)
+    express = enqueue("express", 60)
+    assert [dequeue(), dequeue(), dequeue()] == [express, standard, bulk]
+
+
+def test_retried_job_keeps_its_deadline(service):
+    urgent = enqueue("express", 60)
+    assert dequeue() == urgent
+    bulk = [enqueue("bulk", 7200) for _ in range(3)]
+
+    # What the worker does when an attempt fails with retries left
+    connection = get_redis_connection_rq()
+    job = Job.fetch(urgent, connection=connection, serializer=JSONSerializer)
+    with connection.pipeline() as pipeline:
+        job.retry(get_queue("express"), pipeline)
+        pipeline.execute()
+
+    assert connection.zscore(deadline_index_key("transactions_express"), urgent) is not None
+    assert [dequeue() for _ in range(4)] == [urgent] + bulk
+
+
+def set_deadline(service, tx_id: str, seconds: int):
+    db = service.SessionLocal()
+    db.query(service.Transaction).filter_by(id=tx_id).update({"deadline": utcnow() + timedelta(seconds=seconds)})
+    db.commit()
+    db.close()
+
+
+def test_terminal_failure_after_the_deadline_is_a_miss(service, monkeypatch):
+    class LateRejection(RechargeBackend):
+        def recharge(self, **kwargs):
+            # The deadline passes while the recharge runs
+            monkeypatch.setattr(service, "utcnow", lambda: utcnow() + timedelta(hours=1))
+            raise TerminalRechargeError("PIN rejected")
+
+    tx_id = add_transaction(service)
+    set_deadline(service, tx_id, 60)
+    monkeypatch.setattr(service, "get_recharge_backend", LateRejection)
+
+    assert service.process_yalla_load_job(tx_id, PAYLOAD) == "error"
+    assert get_deadline_metrics(get_redis_connection())["standard"]["missed"] == 1
+
+
+def test_last_failed_attempt_after_the_deadline_is_a_miss(service):
+    late, on_time = add_transaction(service), add_transaction(service)
+    set_deadline(service, late, -60)
+    set_deadline(service, on_time, 60)
+
+    for tx_id in (late, on_time):
+        service.on_job_failure(SimpleNamespace(should_retry=False, args=[tx_id]), None, None, None, None)
+    # Already settled, not counted twice
+    service.on_job_failure(SimpleNamespace(should_retry=False, args=[late]), None, None, None, None)
+
+    assert service.get_status(late).status == service.get_status(on_time).status == "error"
+    assert get_deadline_metrics(get_redis_connection())["standard"]["missed"] == 1
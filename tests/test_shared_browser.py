@@ -0,0 +1,84 @@
+import os
+import stat
+import sys
+import textwrap
+from contextlib import contextmanager
+
+import pytest
+from selenium.webdriver.chrome.options import Options
+
+from yalla_ludo import service as yalla_service
+from yalla_ludo.page_profile import get_page_load_profile
+from yalla_ludo.shared_browser import SharedChrome, is_browser_alive
+
+# Stands in for Chrome: serves /json/version on the debugging port and
+# writes DevToolsActivePort like the real browser does
+FAKE_CHROME = textwrap.dedent("""\
+    import os, sys
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    args = dict(a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", int(args["remote-debugging-port"])), Handler)
+    with open(os.path.join(args["user-data-dir"], "DevToolsActivePort"), "w") as fh:
+        fh.write(f"{server.server_address[1]}\\n")
+    server.serve_forever()
+""")
+
+
+@pytest.fixture
+def chrome(tmp_path):
+    binary = tmp_path / "fake-chrome"
+    binary.write_text(f"#!{sys.executable}\n{FAKE_CHROME}")
+    binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    chrome = SharedChrome(Options(), binary=str(binary))
+    chrome.start()
+    yield chrome
+    chrome.stop()
+
+
+def test_dead_chrome_is_relaunched_on_the_same_address(chrome):
+    address = chrome.address
+    assert chrome.ensure_running() is False
+
+    chrome.process.kill()
+    chrome.process.wait()
+    assert not is_browser_alive(address)
+
+    assert chrome.ensure_running() is True
+    assert chrome.address == address
+    assert os.environ["CHROME_DEBUGGER_ADDRESS"] == address
+    assert is_browser_alive(address)
+
+
+def test_jobs_fall_back_to_a_dedicated_chrome_when_shared_one_is_down(monkeypatch, caplog):
+    opened = []
+
+    @contextmanager
+    def shared_context(*args, **kwargs):
+        opened.append("shared")
+        yield None
+
+    class DedicatedDriver:
+        def quit(self):
+            pass
+
+    monkeypatch.setenv("CHROME_MODE", "shared")
+    monkeypatch.setenv("CHROME_DEBUGGER_ADDRESS", "127.0.0.1:9")
+    monkeypatch.setattr(yalla_service, "isolated_context", shared_context)
+    monkeypatch.setattr(yalla_service, "setup_undetectable_chrome", lambda profile: opened.append("dedicated") or DedicatedDriver())
+
+    with yalla_service.open_recharge_browser(get_page_load_profile()):
+        pass
+
+    assert opened == ["dedicated"]
+    assert "not responding" in caplog.text
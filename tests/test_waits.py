@@ -0,0 +1,24 @@
+import pytest
+
+from yalla_ludo.waits import WAIT_PROFILES, WaitStrategy
+
+
+def test_failed_step_is_recorded():
+    waits = WaitStrategy(driver=None, profile=WAIT_PROFILES["fast"])
+    with waits.step("player_id"):
+        pass
+    with pytest.raises(TimeoutError):
+        with waits.step("confirm_player"):
+            raise TimeoutError
+
+    rows = waits.report()
+    assert [(row["step"], row["failed"]) for row in rows] == [("player_id", False), ("confirm_player", True)]
+    assert waits._current is None
+
+
+def test_saved_sleep_is_an_estimate_against_the_human_profile():
+    waits = WaitStrategy(driver=None, profile=WAIT_PROFILES["fast"])
+    with waits.step("item_type"):
+        pass
+    # human sleeps 3-6 s after item_type, fast does not sleep
+    assert waits.report()[0]["est_saved_s"] == 4.5
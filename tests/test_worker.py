@@ -0,0 +1,113 @@
+import os
+import subprocess
+import time
+
+import psutil
+import pytest
+from rq.serializers import JSONSerializer
+
+from test_reconciler import add_transaction, enqueue
+from transaction import worker as worker_module
+from transaction.process_reaper import JOB_TAG, ResourceSampler, reap_tagged_processes
+from transaction.scheduling import DeadlineQueue
+from transaction.worker import TransactionWorker, get_queue, get_queues, get_redis_connection_rq
+
+
+@pytest.fixture
+def spawn():
+    """Start ``sleep`` processes, killing whatever is left at the end."""
+    processes = []
+
+    def start(**env):
+        proc = subprocess.Popen(["sleep", "300"], env={**os.environ, **env})
+        processes.append(proc)
+        return proc
+
+    yield start
+    for proc in processes:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def wait_for_environ(proc, tag: str):
+    # The environment is readable once exec() has completed
+    for _ in range(50):
+        if psutil.Process(proc.pid).environ().get(tag):
+            return
+        time.sleep(0.02)
+
+
+def test_tagged_processes_are_reaped(spawn):
+    tagged = spawn(**{JOB_TAG: "job-1"})
+    other_job = spawn(**{JOB_TAG: "job-2"})
+    untagged = spawn()
+    wait_for_environ(tagged, JOB_TAG)
+    wait_for_environ(other_job, JOB_TAG)
+
+    assert reap_tagged_processes(JOB_TAG, "job-1", timeout=2) == 1
+    assert not psutil.pid_exists(tagged.pid) or psutil.Process(tagged.pid).status() == psutil.STATUS_ZOMBIE
+    assert other_job.poll() is None
+    assert untagged.poll() is None
+    assert reap_tagged_processes(JOB_TAG, "job-1", timeout=2) == 0
+
+
+def test_resource_sampler_covers_the_process_tree(spawn):
+    sampler = ResourceSampler(interval=0.05).start()
+    spawn()
+    spawn()
+    deadline = time.process_time() + 0.2
+    while time.process_time() < deadline:
+        pass
+    usage = sampler.stop()
+
+    assert usage["peak_processes"] >= 3
+    assert usage["peak_rss_mb"] > 0
+    # Only the CPU used since start() is counted
+    assert 0.15 <= usage["cpu_seconds"] < 5
+
+
+@pytest.fixture
+def transaction_worker(service, monkeypatch):
+    worker = TransactionWorker(
+        get_queues(), connection=get_redis_connection_rq(), serializer=JSONSerializer, queue_class=DeadlineQueue
+    )
+    worker.heartbeats = 0
+
+    def heartbeat(*args, **kwargs):
+        worker.heartbeats += 1
+
+    monkeypatch.setattr(worker, "heartbeat", heartbeat)
+    monkeypatch.setattr(worker, "memory_check_interval", 0)
+    monkeypatch.setenv("WORKER_MIN_FREE_MEMORY_MB", "512")
+    return worker
+
+
+def test_no_job_is_taken_while_memory_is_low(service, transaction_worker, monkeypatch):
+    tx_id = add_transaction(service)
+    enqueue(service, tx_id)
+    readings = iter([100, 100])
+
+    def available_mb():
+        reading = next(readings, None)
+        if reading is None:
+            # Stopped while waiting for memory
+            transaction_worker._stop_requested = True
+            return 100
+        return reading
+
+    monkeypatch.setattr(worker_module, "get_available_memory_mb", available_mb)
+    assert transaction_worker.dequeue_job_and_maintain_ttl(timeout=1) is None
+    # Still alive for the monitoring while waiting
+    assert transaction_worker.heartbeats == 2
+    assert get_queue("standard").get_job_position(tx_id) is not None
+
+
+def test_job_is_taken_once_memory_is_back(service, transaction_worker, monkeypatch):
+    tx_id = add_transaction(service)
+    enqueue(service, tx_id)
+    readings = iter([100, 4096])
+    monkeypatch.setattr(worker_module, "get_available_memory_mb", lambda: next(readings))
+
+    job, queue = transaction_worker.dequeue_job_and_maintain_ttl(timeout=1)
+    assert (job.id, queue.name) == (tx_id, get_queue("standard").name)
@@ -1,8 +1,13 @@
+import logging
 from fastapi import FastAPI, HTTPException, Header
 from pydantic import BaseModel
 from typing import Any, Dict
+from src.logging_setup import configure_logging, log_context
 from src.transaction.schema import GlizerWebhookPayload
 
+configure_logging()
+logger = logging.getLogger("webhook")
+
 app = FastAPI()
 
 @app.post("/webhook")
@@ -17,17 +22,18 @@ async def receive_webhook(
     #     raise HTTPException(status_code=401, detail="Invalid authorization header")
     
     # Log the received webhook
-    print(f"Received webhook - Event: {payload.event}, Data: {payload.model_dump_json()}")
+    logger.info("Received webhook - Event: %s", payload.event, extra={"fields": {"data": payload.model_dump()}})
     
     # Process the webhook based on event type
     if payload.event == "ON_TRANSACTION_STATUS_CHANGED":
         # Handle transaction update
         transaction_id = payload.transactionsId
         status = payload.status
-        print(f"Transaction {transaction_id} updated to status: {status}")
+        with log_context(tx_id=transaction_id):
+            logger.info("Transaction %s updated to status: %s", transaction_id, status)
     
     return {"status": "received", "message": "Webhook processed successfully"}
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="localhost", port=8001)
+    uvicorn.run(app, host="localhost", port=8001, log_config=None)
@@ -6,23 +6,19 @@ Usage: python worker.py
 
 import os
 import sys
-import logging
 from dotenv import load_dotenv
 
 # Add src to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
+from logging_setup import configure_logging
 from transaction.worker import start_worker
 
 # Load environment variables
 load_dotenv()
 
 # Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 
 if __name__ == "__main__":
-    print("Starting RQ worker for transaction processing...")
     start_worker() 
\ No newline at end of file